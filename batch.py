@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import argparse
+import toml
+from concurrent.futures import ThreadPoolExecutor
+from uoc_export import write_file
+
+# Several accounts with one config file, e.g.:
+# py batch.py --config batch.toml --workers 3
+# Options outside [[accounts]] are shared (chromedriver, fetch_backend, browser, ...), each [[accounts]] has
+# username, password, classroomIds, classroomId_colors, classroomId_names, classroomId_subjectIds & output_dir.
+# Accounts run at the same time (batch_workers, each one with its own browser only for login with
+# fetch_backend = "http") & an error in one account doesn't stop the others.
+
+BATCH_OPTIONS = ("accounts", "batch_workers", "batch_report")
+# files of each account (name with the username) if not set in [[accounts]]
+ACCOUNT_FILES = {"snapshot": ".uoc_snapshot.json", "metrics_json": "metrics.json", "metrics_prom": "",
+                 "store_path": ""}
+
+
+def get_account_file(path, username):
+    root, extension = os.path.splitext(path)
+    return f"{root}_{username}{extension}"
+
+
+def get_account_config(config, account):
+    # shared options + options of the account
+    account_config = {key: value for key, value in config.items() if key not in BATCH_OPTIONS}
+    account_config.update(account)
+    username = account.get("username", "")
+    for key, default in ACCOUNT_FILES.items():
+        if key not in account and config.get(key, default) != "":
+            account_config[key] = get_account_file(config.get(key, default), username)
+    # metrics of several accounts in the same prometheus collector
+    account_config["metrics_labels"] = dict(config.get("metrics_labels", dict()), account=username)
+    if "output_dir" not in account:
+        account_config["output_dir"] = os.path.join(config.get("output_dir", "accounts"), username)
+    return account_config
+
+
+def run_account(account_config, notify=False):
+    # status ok (all classrooms), partial (some classroom with error) or failed
+    from uoc import UOC
+    start = time.monotonic()
+    result = {"username": account_config.get("username", ""), "status": "failed", "error": "",
+              "activities": 0, "new_messages": 0, "page_errors": dict()}
+    uoc = None
+    try:
+        os.makedirs(account_config["output_dir"], exist_ok=True)
+        uoc = UOC(account_config)
+        if not uoc.error:
+            uoc.login_UOC()
+            if not uoc.error and uoc.campusSessionId == "":
+                uoc.error = True
+                uoc.errorMessage = "Error in login: session not found (username or password?)"
+        if not uoc.error:
+            uoc.get_timeline_html(sorted_by="days", create_csv=True)
+            uoc.get_messages(notify=notify)
+            uoc.write_metrics()
+            result["activities"] = len(uoc.timeline)
+            result["new_messages"] = sum(nuevos for nombre, nuevos, todos in uoc.get_message_counters().values())
+            result["page_errors"] = dict(uoc.page_errors)
+            # ok, timed-out, failed or stale-from-cache by classroom
+            result["classrooms"] = dict(uoc.classroom_status)
+            result["status"] = "partial" if any(status != "ok" for status in uoc.classroom_status.values()) \
+                or len(uoc.page_errors) > 0 else "ok"
+        else:
+            result["error"] = uoc.errorMessage
+    except Exception as err:
+        result["error"] = str(err)
+    finally:
+        if uoc is not None:
+            try:
+                uoc.close_http()
+                uoc.quit_driver()
+            except Exception:
+                pass
+    result["seconds"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def run_batch(config, workers=None, notify=False):
+    accounts = config.get("accounts", list())
+    workers = max(1, min(workers or config.get("batch_workers", 2), len(accounts)))
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda account: run_account(get_account_config(config, account), notify),
+                                    accounts))
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workers": workers,
+        "seconds": round(time.monotonic() - start, 3),
+        "accounts": results
+    }
+
+
+def print_report(report):
+    print(f"{'username':<20} {'status':<8} {'activities':>10} {'messages':>8} {'seconds':>8}  error")
+    for result in report["accounts"]:
+        error = result["error"] or ", ".join(f"{classroomId} {status}" for classroomId, status
+                                             in result.get("classrooms", dict()).items() if status != "ok")
+        print(f"{result['username']:<20} {result['status']:<8} {result['activities']:>10} "
+              f"{result['new_messages']:>8} {result['seconds']:>8}  {error}")
+    statuses = [result["status"] for result in report["accounts"]]
+    print(f"{len(statuses)} accounts ({statuses.count('ok')} ok, {statuses.count('partial')} partial, "
+          f"{statuses.count('failed')} failed) in {report['seconds']}s with {report['workers']} workers")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Timeline UOC for several accounts")
+    arg_parser.add_argument("--config", default="batch.toml", help="config file (toml) with [[accounts]]")
+    arg_parser.add_argument("--workers", type=int, default=None, help="accounts at the same time")
+    arg_parser.add_argument("--notify", action="store_true", help="show notifications of new messages")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.config, 'r', encoding='UTF-8') as f:
+        config = toml.load(f)
+    if len(config.get("accounts", list())) == 0:
+        print("No [[accounts]] in config file!")
+        return 1
+
+    report = run_batch(config, args.workers, args.notify)
+    print_report(report)
+    if config.get("batch_report", "batch.json") != "":
+        write_file(config.get("batch_report", "batch.json"), json.dumps(report, indent=2).encode("UTF-8"))
+    return 0 if all(result["status"] != "failed" for result in report["accounts"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
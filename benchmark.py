@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from uoc_export import TimelineExporter
+from uoc_model import sort_activities
+from uoc_parser import ClassroomPage, extract_timeline, extract_messages
+
+# Offline benchmark with a local mock of the UOC campus (login form & classroom pages), e.g.:
+# py benchmark.py --classrooms 7 --activities 30 --latency 0.2 --chromedriver path/chromedriver
+# Without chromedriver only parser & export are measured.
+
+TYPES = ["PEC", "Práctica", "No evaluable", "Debate"]
+LOGIN_HTML = '''<!DOCTYPE html>
+<html><head><title>Login</title></head><body>
+<form method="post" action="/login">
+<input type="text" name="j_username" /><input type="password" name="j_password" />
+<input type="submit" value="Login" />
+</form></body></html>'''
+
+
+def get_classroom_html(classroomId, activities, forums=3, padding_kb=0):
+    # page like Classroom.action: 2 tl-placeholder divs, tl-line by type & marcadors links
+    rnd = random.Random(classroomId)
+    start = date.today() - timedelta(days=60)
+    parts = ['<!DOCTYPE html><html><head><title>Classroom</title></head><body><div id="container">',
+             '<div class="tl-placeholder"><div class="tl-line"><h2>Hoy</h2></div></div>',
+             '<div class="tl-placeholder">']
+    for type_index, tipo in enumerate(TYPES):
+        parts.append(f'<div class="tl-line"><h2>{tipo}</h2><ul>')
+        for i in range(type_index, activities, len(TYPES)):
+            inicio = start + timedelta(days=rnd.randint(0, 90))
+            entrega = inicio + timedelta(days=rnd.randint(5, 40))
+            completed = " completed" if entrega < date.today() else ""
+            name = f"{tipo} {i + 1} aula {classroomId}"
+            dates = f'Inicio: {inicio.strftime("%d/%m/%Y")} Fin: {entrega.strftime("%d/%m/%Y")}'
+            parts.append(f'<li><a href="/webapps/aulaca/activity?id={classroomId}_{i}" '
+                         f'class="tl-activity{completed}" data-id="{classroomId}_{i}" '
+                         f'aria-label="{name}. {dates}" title="{name} {dates}"><span>{name}</span></a></li>')
+        parts.append('</ul></div>')
+    parts.append('</div><div class="forums">')
+    for i in range(forums):
+        parts.append(f'<a class="marcadors LaunchesOWin" href="/webapps/forum?id={classroomId}_{i}" '
+                     f'data-bocamoll-object-description="Foro {i + 1}">'
+                     f'<span class="new">{rnd.randint(0, 3)}</span><span class="all">{rnd.randint(3, 50)}</span></a>')
+    parts.append('</div>')
+    if padding_kb > 0:
+        # other content of the real page (menus, scripts, ...)
+        parts.append('<nav>' + '<a href="#">menu</a>' * (padding_kb * 1024 // 20) + '</nav>')
+    parts.append('</div></body></html>')
+    return "".join(parts)
+
+
+class MockCampus:
+    # local server: /auth (login form), /login (sets campusSessionId) & classroom pages
+    CLASSROOM_PATH = "/webapps/aulaca/classroom/Classroom.action"
+
+    def __init__(self, classrooms=7, activities=30, forums=3, latency=0.0, padding_kb=0):
+        self.classroomIds = [str(100001 + i) for i in range(classrooms)]
+        self.pages = {classroomId: get_classroom_html(classroomId, activities, forums, padding_kb).encode("UTF-8")
+                      for classroomId in self.classroomIds}
+        self.latency = latency
+        self.sessions = set()
+        self.requests = dict()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.get_handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def count(self, name):
+        with self.lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def get_handler(self):
+        campus = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or dict()).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "text/html; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def get_session(self):
+                for cookie in self.headers.get("Cookie", "").split(";"):
+                    name, _, value = cookie.strip().partition("=")
+                    if name == "campusSessionId":
+                        return value
+                return ""
+
+            def do_GET(self):
+                time.sleep(campus.latency)
+                url = urlsplit(self.path)
+                if url.path == "/auth":
+                    campus.count("login_form")
+                    self.send(200, LOGIN_HTML.encode("UTF-8"))
+                elif url.path == MockCampus.CLASSROOM_PATH:
+                    campus.count("classroom")
+                    classroomId = parse_qs(url.query).get("classroomId", [""])[0]
+                    if self.get_session() not in campus.sessions:
+                        self.send(302, headers={"Location": "/auth"})
+                    elif classroomId not in campus.pages:
+                        self.send(404)
+                    else:
+                        self.send(200, campus.pages[classroomId])
+                else:
+                    campus.count("other")
+                    self.send(200, b"<html><body>campus</body></html>")
+
+            def do_POST(self):
+                time.sleep(campus.latency)
+                campus.count("login")
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                session = f"bench{len(campus.sessions) + 1}"
+                campus.sessions.add(session)
+                self.send(302, headers={"Location": "/campus", "Set-Cookie": f"campusSessionId={session}; Path=/"})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_config(self, chromedriver, output_dir, fetch_backend="selenium", workers=1, browser_profile="default"):
+        return {
+            "username": "bench",
+            "password": "bench",
+            "path_executable_chromedriver": chromedriver,
+            "classroomIds": self.classroomIds,
+            "classroomId_colors": {classroomId: "#EEF4D0" for classroomId in self.classroomIds},
+            "classroomId_names": {classroomId: f"Aula {classroomId}" for classroomId in self.classroomIds},
+            "classroomId_subjectIds": {classroomId: int(classroomId) + 1000 for classroomId in self.classroomIds},
+            "page_login_uoc": f"{self.url}/auth",
+            "page_classroom_uoc": f"{self.url}{MockCampus.CLASSROOM_PATH}?",
+            "session_cache": "",
+            "output_dir": output_dir,
+            # not the snapshot of the real scrapes
+            "snapshot": os.path.join(output_dir, "snapshot.json"),
+            "fetch_backend": fetch_backend,
+            "workers": workers,
+            "browser": {"profile": browser_profile},
+            "metrics": True,
+            "metrics_json": ""
+        }
+
+
+def timed(results, name, function, *args):
+    start = time.perf_counter()
+    value = function(*args)
+    results[name] = time.perf_counter() - start
+    return value
+
+
+def benchmark_parser(campus, repeat):
+    # parse the pages of all classrooms (no browser)
+    results = dict()
+    today = date.today()
+    html_pages = {classroomId: page.decode("UTF-8") for classroomId, page in campus.pages.items()}
+    start = time.perf_counter()
+    timeline = dict()
+    for _ in range(repeat):
+        timeline = dict()
+        for classroomId, html in html_pages.items():
+            page = ClassroomPage(html, campus.url + MockCampus.CLASSROOM_PATH)
+            timeline.update(extract_timeline(page, classroomId, classroomId, "", page.url, today))
+            extract_messages(page)
+    results["parse_all_classrooms"] = (time.perf_counter() - start) / repeat
+    results["activities"] = len(timeline)
+    # all files of the timeline (html, csv, ics & json)
+    with tempfile.TemporaryDirectory(prefix="benchmark_export_") as output_dir:
+        start = time.perf_counter()
+        exporter = TimelineExporter(output_dir)
+        for activity in sort_activities(timeline.values(), "days"):
+            exporter.add(activity, "#EEF4D0")
+        exporter.write(today.strftime("%d/%m/%Y"))
+        results["export_all_formats"] = time.perf_counter() - start
+    results["html_bytes"] = sum(len(page) for page in campus.pages.values())
+    return results
+
+
+def benchmark_uoc(campus, chromedriver, fetch_backend, workers, browser_profile):
+    # end-to-end with UOC class (browser needed for login), files in a temporary directory
+    with tempfile.TemporaryDirectory(prefix="benchmark_uoc_") as output_dir:
+        config = campus.get_config(chromedriver, output_dir, fetch_backend, workers, browser_profile)
+        return run_uoc(config)
+
+
+def run_uoc(config):
+    # times of each phase of a scrape
+    from uoc import UOC
+    results = dict()
+    uoc = timed(results, "init", UOC, config)
+    if uoc.error:
+        raise RuntimeError(uoc.errorMessage)
+    timed(results, "login_UOC", uoc.login_UOC)
+    if uoc.error or uoc.campusSessionId == "":
+        raise RuntimeError(f"Login failed: {uoc.errorMessage}")
+    timed(results, "get_timeline", uoc.get_timeline)
+    timed(results, "get_messages", uoc.get_messages, False)
+    # pages already in cache: only extraction & files
+    timed(results, "get_timeline_html", uoc.get_timeline_html, "days", True)
+    results["activities"] = len(uoc.timeline)
+    results["page_load_times"] = uoc.page_load_times
+    results["page_errors"] = uoc.page_errors
+    results["webdriver_commands"] = uoc.metrics.get_counter("webdriver_commands")
+    results["page_loads"] = uoc.metrics.get_counter("page_loads")
+    results["metrics"] = uoc.metrics.get_report()
+    uoc.close_http()
+    uoc.quit_driver()
+    del uoc
+    return results
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark with a local mock of the UOC campus")
+    arg_parser.add_argument("--classrooms", type=int, default=7)
+    arg_parser.add_argument("--activities", type=int, default=30, help="activities by classroom")
+    arg_parser.add_argument("--forums", type=int, default=3, help="forums by classroom")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each request")
+    arg_parser.add_argument("--padding-kb", type=int, default=50, help="extra html by page (kB)")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="repetitions of the parser benchmark")
+    arg_parser.add_argument("--chromedriver", default="", help="chromedriver path (end-to-end benchmark)")
+    arg_parser.add_argument("--fetch-backend", default="selenium", choices=["selenium", "http"])
+    arg_parser.add_argument("--workers", type=int, default=1)
+    arg_parser.add_argument("--browser-profile", default="default", help="default or lean")
+    arg_parser.add_argument("--output", default="benchmark.json", help="results file (json)")
+    args = arg_parser.parse_args(argv)
+
+    campus = MockCampus(args.classrooms, args.activities, args.forums, args.latency, args.padding_kb).start()
+    report = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "params": vars(args),
+        "parser": benchmark_parser(campus, args.repeat)
+    }
+    try:
+        if args.chromedriver != "":
+            report["uoc"] = benchmark_uoc(campus, args.chromedriver, args.fetch_backend, args.workers,
+                                          args.browser_profile)
+    finally:
+        report["requests"] = campus.requests
+        campus.stop()
+
+    with open(args.output, "w", encoding="UTF-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import time
+import argparse
+import subprocess
+import urllib.request
+
+# Keep a chromedriver running to be used by several runs & accounts ([browser_service] in config), e.g.:
+# py browser_service.py --chromedriver C:\chromedriver.exe --port 9515
+# If chromedriver stops it's started again.
+
+
+def is_ready(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/status", timeout=1) as response:
+            return response.status == 200
+    except Exception:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chromedriver service for Timeline UOC")
+    parser.add_argument("--chromedriver", required=True, help="chromedriver path")
+    parser.add_argument("--port", type=int, default=9515)
+    parser.add_argument("--check-interval", type=float, default=5, help="seconds between checks")
+    args = parser.parse_args(argv)
+
+    process = None
+    try:
+        while True:
+            if process is None or process.poll() is not None or not is_ready(args.port):
+                if process is not None:
+                    print(f"Chromedriver not working (exit code {process.poll()}), restarting")
+                    process.kill()
+                    process.wait()
+                process = subprocess.Popen([args.chromedriver, f"--port={args.port}"])
+                # wait until ready
+                for _ in range(50):
+                    if is_ready(args.port):
+                        break
+                    time.sleep(0.1)
+                print(f"Chromedriver ready on port {args.port}")
+            time.sleep(args.check_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import gzip
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Timeline of the last scrape (snapshot) as calendar & json for calendar clients, e.g.:
+# py main.py serve --port 8765   ->   http://127.0.0.1:8765/timeline.ics & /timeline.json
+# Feeds are created again only when the snapshot changes (without days to the end, so they don't change each day),
+# clients with the same ETag / Last-Modified get 304 without body.
+
+CONTENT_TYPES = {"ics": "text/calendar; charset=UTF-8", "json": "application/json; charset=UTF-8"}
+
+
+class Feed:
+    # content of a format, gzip version & validators (etag changes only if content changes)
+    def __init__(self, content, last_modified):
+        self.content = content
+        self.gzip_content = gzip.compress(content, mtime=0)
+        self.etag = hashlib.sha256(content).hexdigest()[:32]
+        self.last_modified = last_modified
+
+
+class FeedServer:
+    def __init__(self, uoc, host="127.0.0.1", port=8765, sorted_by="inicio"):
+        self.uoc = uoc
+        self.sorted_by = sorted_by
+        self.feeds = dict()
+        # (mtime, size) of the snapshot used for the feeds
+        self.version = None
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self.get_handler())
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def get_snapshot_version(self):
+        path = self.uoc.config.get("snapshot", ".uoc_snapshot.json")
+        if path == "" or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_feeds(self):
+        with self.lock:
+            version = self.get_snapshot_version()
+            if version is not None and version != self.version:
+                self.uoc.error = False
+                if self.uoc.load_snapshot():
+                    # date of the scrape that changed the activities (not today): same data, same feeds
+                    snapshot = self.uoc.read_snapshot()
+                    date_scrape = snapshot.get("timeline_changed_date",
+                                               snapshot.get("timeline_date", self.uoc.get_date_spain()))
+                    stamp = datetime.strptime(date_scrape, "%d/%m/%Y").replace(tzinfo=timezone.utc)
+                    contents = self.uoc.get_exporter(self.sorted_by, tuple(CONTENT_TYPES), countdown=False,
+                                                     stamp=stamp).get_contents(date_scrape)
+                    for format, content in contents.items():
+                        feed = self.feeds.get(format)
+                        # same content: same etag & last modified (time the content changed)
+                        if feed is None or feed.content != content:
+                            # always later than the old one (http dates in seconds)
+                            last_modified = int(time.time()) if feed is None else \
+                                max(int(time.time()), feed.last_modified + 1)
+                            self.feeds[format] = Feed(content, last_modified)
+                    self.version = version
+            return self.feeds
+
+    def get_handler(self):
+        feed_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or dict()).items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD" and status != 304:
+                    self.wfile.write(body)
+
+            def is_not_modified(self, feed, etag):
+                # If-None-Match has priority over If-Modified-Since
+                if_none_match = self.headers.get("If-None-Match")
+                if if_none_match is not None:
+                    etags = [value.strip().replace("W/", "", 1) for value in if_none_match.split(",")]
+                    return "*" in etags or etag in etags
+                if_modified_since = self.headers.get("If-Modified-Since")
+                if if_modified_since is not None:
+                    try:
+                        return feed.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+                    except (TypeError, ValueError):
+                        return False
+                return False
+
+            def do_GET(self):
+                name, _, format = self.path.split("?")[0].lstrip("/").partition(".")
+                if name != "timeline" or format not in CONTENT_TYPES:
+                    self.send(404, b"Not found")
+                    return
+                feed = feed_server.get_feeds().get(format)
+                if feed is None:
+                    self.send(503, b"Snapshot not found, run scrape first!")
+                    return
+                use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+                # each encoding with its own etag
+                etag = f'"{feed.etag}-gzip"' if use_gzip else f'"{feed.etag}"'
+                headers = {"ETag": etag, "Last-Modified": formatdate(feed.last_modified, usegmt=True),
+                           "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+                if self.is_not_modified(feed, etag):
+                    self.send(304, headers=headers)
+                    return
+                headers["Content-Type"] = CONTENT_TYPES[format]
+                if use_gzip:
+                    headers["Content-Encoding"] = "gzip"
+                self.send(200, feed.gzip_content if use_gzip else feed.content, headers)
+
+            do_HEAD = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        print(f"Timeline feeds: {self.url}/timeline.ics {self.url}/timeline.json")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,23 +1,78 @@
+import time
+import argparse
 import toml
 from uoc import UOC
 
+# commands:
+#   py main.py [scrape [--watch]]     login, timeline files & messages (default)
+#   py main.py messages [--watch]     login & messages
+#   py main.py render [--sort days]   timeline files from the last scrape (without browser)
+#   py main.py upcoming [--days 7]    activities to deliver in the next days (without browser)
+#   py main.py changes [--days 1]    activities added, changed, completed or reopened (store_path in config)
+#   py main.py serve [--port 8765]    timeline.ics & timeline.json of the last scrape for calendar clients
+parser = argparse.ArgumentParser(description="Timeline UOC")
+parser.add_argument("--config", default="config.toml", help="config file (toml)")
+subparsers = parser.add_subparsers(dest="command")
+parser_scrape = subparsers.add_parser("scrape", help="login, create timeline files & view messages")
+parser_scrape.add_argument("--watch", action="store_true", help="keep checking messages")
+parser_messages = subparsers.add_parser("messages", help="login & view messages")
+parser_messages.add_argument("--watch", action="store_true", help="keep checking messages")
+parser_render = subparsers.add_parser("render", help="create timeline files from the last scrape")
+parser_render.add_argument("--sort", default="days", help="field to sort the timeline")
+parser_upcoming = subparsers.add_parser("upcoming", help="activities to deliver in the next days")
+parser_upcoming.add_argument("--days", type=int, default=7)
+parser_changes = subparsers.add_parser("changes", help="activities changed in the last days (store_path)")
+parser_changes.add_argument("--days", type=float, default=1)
+parser_serve = subparsers.add_parser("serve", help="serve timeline.ics & timeline.json of the last scrape")
+parser_serve.add_argument("--host", default="127.0.0.1")
+parser_serve.add_argument("--port", type=int, default=8765)
+parser_serve.add_argument("--sort", default="days", help="field to sort the timeline")
+args = parser.parse_args()
+command = args.command or "scrape"
+
 # get variables from file toml (config.toml)
-file_config = "config.toml"
-with open(file_config, 'r', encoding='UTF-8') as f:
+with open(args.config, 'r', encoding='UTF-8') as f:
     config = toml.load(f)
 
-# create object uoc
-uoc = UOC(config)
+# create object uoc (browser is started only if needed, chromedriver only for scrape & messages)
+uoc = UOC(config, browser=command in ("scrape", "messages"))
 
 if not uoc.error:
-    # login
-    uoc.login_UOC()
-    if uoc.campusSessionId != "" and not uoc.error:
-        # create timeline html to show
-        uoc.get_timeline_html(sorted_by="days", create_csv=True)
-        # view messages
-        uoc.get_messages()
+    if command in ("scrape", "messages"):
+        # login
+        uoc.login_UOC()
+        if uoc.campusSessionId != "" and not uoc.error:
+            if command == "scrape":
+                # create timeline html to show
+                uoc.get_timeline_html(sorted_by="days", create_csv=True)
+            # view messages
+            uoc.get_messages()
+            if args.watch:
+                # keep checking messages (only notify new ones)
+                uoc.watch_messages(config.get("watch_interval", 60), config.get("watch_max_interval", 900))
+            # classrooms not loaded (timed-out, failed or stale-from-cache)
+            for classroomId, (status, error) in uoc.get_classroom_status().items():
+                if status != "ok":
+                    print(f"{uoc.classroomId_names[classroomId]} ({classroomId}): {status} {error}")
+    elif command == "render":
+        if uoc.load_snapshot():
+            uoc.render_timeline(sorted_by=args.sort, create_csv=True)
+    elif command == "upcoming":
+        if uoc.load_snapshot():
+            for activity in uoc.get_upcoming(args.days):
+                print(f"{activity.entrega} ({activity.days} days) {activity.classroom_name} -> "
+                      f"{activity.type}: {activity.activity_name}")
+    elif command == "changes":
+        for changed, change, activity in uoc.get_changes(args.days):
+            print(f"{time.strftime('%d/%m/%Y %H:%M', time.localtime(changed))} {change}: {activity.classroom_name} -> "
+                  f"{activity.type}: {activity.activity_name} ({activity.entrega})")
+    elif command == "serve":
+        from feed_server import FeedServer
+        FeedServer(uoc, args.host, args.port, args.sort).serve_forever()
 
+# send pending notifications
+uoc.close_notifier()
 if uoc.error:
     print(uoc.errorMessage)
-
+else:
+    uoc.write_metrics()
@@ -0,0 +1,65 @@
+import pytest
+import urllib3
+from benchmark import MockCampus
+from uoc import UOC
+from uoc_http import HttpFetcher
+
+# http backend against the local mock of the campus
+
+
+@pytest.fixture
+def campus():
+    campus = MockCampus(classrooms=2, activities=4).start()
+    campus.sessions.add("s1")
+    yield campus
+    campus.stop()
+
+
+def get_fetcher(campus, session="s1"):
+    return HttpFetcher([{"name": "campusSessionId", "value": session, "domain": "127.0.0.1", "path": "/"}])
+
+
+def get_uoc(campus, tmp_path, session="s1"):
+    config = campus.get_config("", str(tmp_path), "http")
+    uoc = UOC(config, browser=False)
+    assert not uoc.error, uoc.errorMessage
+    uoc.campusSessionId = session
+    uoc.http = get_fetcher(campus, session)
+    return uoc
+
+
+def test_get_classroom_page(campus):
+    http = get_fetcher(campus)
+    url = f"{campus.url}{MockCampus.CLASSROOM_PATH}?classroomId=100001"
+    html, final_url = http.get(url)
+    assert html == campus.pages["100001"].decode("UTF-8")
+    assert final_url == url
+    http.close()
+
+
+def test_cookies_only_for_their_domain():
+    http = HttpFetcher([{"name": "campusSessionId", "value": "s1", "domain": ".uoc.edu", "path": "/"}])
+    assert http.get_cookie_header("https://campus.uoc.edu/webapps") == "campusSessionId=s1"
+    assert http.get_cookie_header("https://example.com/") == ""
+
+
+def test_http_error(campus):
+    http = get_fetcher(campus)
+    with pytest.raises(urllib3.exceptions.HTTPError):
+        http.get(f"{campus.url}{MockCampus.CLASSROOM_PATH}?classroomId=999999")
+    http.close()
+
+
+def test_get_page(campus, tmp_path):
+    uoc = get_uoc(campus, tmp_path)
+    page = uoc.get_page(uoc.get_data_url(101001, "100001"), "100001")
+    assert len(page.root.find_elements_by_class("tl-line")) == 5
+    uoc.close_http()
+
+
+def test_session_expired(campus, tmp_path):
+    # redirected to /auth without a valid session
+    uoc = get_uoc(campus, tmp_path, session="expired")
+    with pytest.raises(ValueError, match="Session expired"):
+        uoc.get_page(uoc.get_data_url(101001, "100001"), "100001")
+    uoc.close_http()
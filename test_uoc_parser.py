@@ -0,0 +1,66 @@
+import random
+from datetime import date, timedelta
+from benchmark import get_classroom_html, MockCampus
+from uoc_model import Activity
+from uoc_parser import ClassroomPage, extract_timeline, extract_messages
+
+# parser without browser with the pages of the mock campus (same output as the selenium extractors)
+PAGE_URL = "http://127.0.0.1" + MockCampus.CLASSROOM_PATH + "?classroomId=100001"
+
+
+def get_page(html):
+    return ClassroomPage(html, PAGE_URL)
+
+
+def test_extract_timeline():
+    today = date.today()
+    timeline = extract_timeline(get_page(get_classroom_html("100001", 4)), "100001", "Aula 100001", 101001,
+                                PAGE_URL, today)
+    # same random dates as get_classroom_html (first activity of each type)
+    rnd = random.Random("100001")
+    start = today - timedelta(days=60)
+    inicio = start + timedelta(days=rnd.randint(0, 90))
+    entrega = inicio + timedelta(days=rnd.randint(5, 40))
+    assert list(timeline) == ["100001_0", "100001_1", "100001_2", "100001_3"]
+    assert timeline["100001_0"] == Activity("100001_0", "http://127.0.0.1/webapps/aulaca/activity?id=100001_0",
+                                            "PEC 1 aula 100001", "100001", "Aula 100001", 101001, PAGE_URL, "PEC",
+                                            entrega < today, inicio, entrega, today)
+    assert [activity.type for activity in timeline.values()] == ["PEC", "Práctica", "No evaluable", "Debate"]
+
+
+def test_extract_timeline_relative_href():
+    html = '<div id="container"><div class="tl-placeholder"></div><div class="tl-placeholder">' \
+           '<div class="tl-line"><h2>PEC</h2><a href="../activity?id=1" data-id="1" class="tl-activity" ' \
+           'aria-label="PEC 1. Inicio: 01/10/2026 Fin: 20/10/2026" title="PEC 1 Inicio: 01/10/2026 Fin: 20/10/2026">' \
+           '</a></div></div></div>'
+    timeline = extract_timeline(get_page(html), "100001", "Aula 100001", 101001, PAGE_URL, date(2026, 10, 18))
+    activity = timeline["1"]
+    assert activity.activity_url == "http://127.0.0.1/webapps/aulaca/activity?id=1"
+    assert activity.activity_name == "PEC 1"
+    assert (activity.inicio, activity.entrega, activity.completed) == ("01/10/2026", "20/10/2026", False)
+
+
+def test_extract_timeline_bad_activity_skipped():
+    html = '<div class="tl-placeholder"></div><div class="tl-placeholder">' \
+           '<div class="tl-line"><span>sin tipo</span></div>' \
+           '<div class="tl-line"><h2>PEC</h2><a data-id="1" title="Inicio: 01/10/2026 Fin: 99/99/2026"></a>' \
+           '<a data-id="2" href="/a2" aria-label="PEC 2. Inicio: x" title="Inicio: 01/10/2026 Fin: 05/10/2026">' \
+           '</a></div></div>'
+    timeline = extract_timeline(get_page(html), "100001", "Aula 100001", 101001, PAGE_URL, date(2026, 10, 18))
+    assert list(timeline) == ["2"]
+
+
+def test_extract_messages():
+    messages = extract_messages(get_page(get_classroom_html("100001", 4, forums=2)))
+    assert [(nombre, link) for nombre, link, nuevos, todos in messages] == [
+        ("Foro 1", "http://127.0.0.1/webapps/forum?id=100001_0"),
+        ("Foro 2", "http://127.0.0.1/webapps/forum?id=100001_1")]
+    # counters as text of the spans (like selenium)
+    assert all(nuevos.isdigit() and todos.isdigit() for nombre, link, nuevos, todos in messages)
+
+
+def test_extract_messages_without_new():
+    html = '<a class="marcadors LaunchesOWin" href="forum?id=1" data-bocamoll-object-description="Foro">' \
+           '<span class="all">7</span></a>'
+    assert extract_messages(get_page(html)) == [
+        ["Foro", "http://127.0.0.1/webapps/aulaca/classroom/forum?id=1", 0, "7"]]
@@ -1,17 +1,72 @@
-from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support import expected_conditions as EC
+# selenium, pytz, plyer, urllib3 & icalendar are imported only when needed (fast start without browser)
 import time
-import re
-from datetime import datetime, time as timed, timedelta
-import pytz
-import csv
-from icalendar import Calendar, Event
+import json
+import queue
+import random
+from urllib.parse import urlsplit, urljoin
+from datetime import datetime
 import os
-from plyer import notification
+from uoc_session import SessionCache
+from uoc_browser import BrowserService, get_browser_profile, get_chrome_options, block_urls
+from uoc_export import TimelineExporter, get_span_code, get_type_color, write_file
+from uoc_model import Activity, sort_activities, group_activities
+from uoc_metrics import Metrics, NullMetrics
+from uoc_notify import NotificationDispatcher, PlyerSink, get_sinks
+from uoc_parser import ClassroomPage, extract_timeline, extract_messages, get_difference_days
+
+
+class PageCache:
+    # classroom pages loaded in this run, key = (classroomId, subjectId, campusSessionId)
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.pages = dict()
+
+    def get(self, key):
+        if key in self.pages:
+            page, loaded = self.pages[key]
+            if self.ttl is None or time.monotonic() - loaded <= self.ttl:
+                return page
+            # stale page
+            del self.pages[key]
+        return None
+
+    def put(self, key, page):
+        self.pages[key] = (page, time.monotonic())
+
+    def invalidate(self, classroomId=None):
+        if classroomId is None:
+            self.pages.clear()
+        else:
+            for key in [key for key in self.pages if key[0] == classroomId]:
+                del self.pages[key]
+
+
+class PageReady:
+    # page is ready when the 2 tl-placeholder divs are present and the counters (timeline lines & marcadors links)
+    # are the same in 2 polls (classrooms without forums have no marcadors links), or when #container is present
+    # and the counters are the same in STABLE_POLLS polls (classrooms without timeline)
+    STABLE_POLLS = 4
+    SCRIPT_COUNTERS = "return [document.getElementsByClassName('tl-placeholder').length, " \
+                      "document.getElementsByClassName('tl-line').length, " \
+                      "document.querySelectorAll('.marcadors.LaunchesOWin').length, " \
+                      "document.getElementById('container') ? 1 : 0];"
+
+    def __init__(self):
+        self.last_counters = None
+        self.stable_polls = 0
+
+    def __call__(self, driver):
+        # only one call to the driver for each poll
+        counters = driver.execute_script(PageReady.SCRIPT_COUNTERS)
+        self.stable_polls = self.stable_polls + 1 if counters == self.last_counters else 0
+        self.last_counters = counters
+        return self.stable_polls >= 1 and counters[0] == 2 or \
+            self.stable_polls >= PageReady.STABLE_POLLS - 1 and counters[3] == 1
+
+
+class PageTimeout(Exception):
+    # classroom page not loaded in its time
+    pass
 
 
 class UOC:
@@ -20,15 +75,24 @@ class UOC:
 
     # https://chromedriver.chromium.org/downloads
 
-    def __init__(self, config):
-        # Init variables
+    def __init__(self, config, browser=True):
+        # Init variables (browser=False: commands without browser, chromedriver not needed)
         self.config = config
+        self.browser = browser
         self.error = False
         self.errorMessage = ""
         self.campusSessionId = ""
         # Check config file
         self.check_config_file()
-        self.driver = None
+        self._driver = None
+        # browsers of the workers (load_pages), kept until quit_driver
+        self.worker_drivers = list()
+        self.worker_session = ""
+        self.http = None
+        self.store = None
+        self.notifier = None
+        # times & counters of the run (metrics = true in config)
+        self.metrics = Metrics(config.get("metrics_labels")) if config.get("metrics", False) else NullMetrics()
         # If not error, set variables
         if not self.error:
             self.username = config["username"]
@@ -37,15 +101,81 @@ class UOC:
             self.classroomId_colors = self.get_classroomId_colors()
             self.classroomId_names = self.get_classroomId_names()
             self.classroomId_subjectIds = self.get_classroomId_subjectIds()
-            # configure options for chrome (run in background & not use GPU)
-            # chrome_options = Options()
-            # chrome_options.add_argument('--headless')
-            # chrome_options.add_argument('--disable-gpu')
-            self.driver = webdriver.Chrome(executable_path=self.config["path_executable_chromedriver"])
+            # pages shared by timeline & messages (ttl in seconds, without ttl pages are loaded once per run)
+            self.page_cache = PageCache(config.get("page_cache_ttl"))
+            # seconds until each page was ready
+            self.page_load_times = dict()
+            # error loading page by classroom
+            self.page_errors = dict()
+            # selenium: all pages with chrome, http: chrome only for login
+            self.fetch_backend = config.get("fetch_backend", "selenium")
+            # session saved between runs (session_cache = "" to disable)
+            session_cache_path = config.get("session_cache", ".uoc_session.json")
+            self.session_cache = SessionCache(session_cache_path) if session_cache_path != "" else None
+            # urls can be changed in config (e.g. local server with saved pages)
+            self.PAGE_LOGIN_UOC = config.get("page_login_uoc", UOC.PAGE_LOGIN_UOC)
+            self.PAGE_CLASSROOM_UOC = config.get("page_classroom_uoc", UOC.PAGE_CLASSROOM_UOC)
+            # options for chrome ([browser] in config: headless, page load strategy, blocked urls, ...)
+            # chrome is started the first time self.driver is used
+            try:
+                self.browser_profile = get_browser_profile(config)
+                # plyer, stdout, file and/or webhook ([notifications] in config)
+                self.notification_sinks = get_sinks(config.get("notifications", dict()))
+            except ValueError as err:
+                self.error = True
+                self.errorMessage = str(err)
+            # chromedriver already running to reuse browsers ([browser_service] in config)
+            self.browser_service = None
+            if "browser_service" in config:
+                browser_service = config["browser_service"]
+                self.browser_service = BrowserService(browser_service.get("url", "http://127.0.0.1:9515"),
+                                                      browser_service.get("state", ".uoc_browser_service.json"),
+                                                      browser_service.get("max_uses", 50),
+                                                      browser_service.get("max_memory_mb", 500))
+            # history of activities & message counters in sqlite (store_path in config, queries without browser)
+            if config.get("store_path", "") != "":
+                from uoc_store import TimelineStore
+                self.store = TimelineStore(config["store_path"])
+            # seconds for the whole run (run_deadline in config), split between the classrooms not loaded yet
+            self.deadline = None
+            self.start_deadline()
+            # status by classroom: ok, timed-out, failed or stale-from-cache (data of the last scrape)
+            self.classroom_status = dict()
             # init timeline & messages
             self.timeline = dict()
             self.messages = dict()
 
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = self.new_driver(self.username)
+        return self._driver
+
+    @driver.setter
+    def driver(self, driver):
+        self._driver = driver
+
+    def quit_driver(self):
+        for driver in self.worker_drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.worker_drivers = list()
+        if self._driver is not None:
+            # browser of the browser service is kept open for next runs
+            if getattr(self._driver, "from_service", False):
+                self.browser_service.release(self.username)
+            else:
+                self._driver.quit()
+            self._driver = None
+
+    def close_http(self):
+        # connections of the old session
+        if self.http is not None:
+            self.http.close()
+            self.http = None
+
     def check_config_file(self):
         if "username" in self.config and "password" in self.config and "classroomIds" in self.config:
             if "classroomId_names" not in self.config or\
@@ -63,7 +193,10 @@ class UOC:
                     self.errorMessage = "Some parameter (classroomId_names, classroomId_colors and/or " \
                                         "classroomId_subjectIds) with different length in config file!"
                 else:
-                    if "path_executable_chromedriver" in self.config and os.path.exists(
+                    if self.config.get("fetch_backend", "selenium") not in ("selenium", "http"):
+                        self.error = True
+                        self.errorMessage = "Parameter fetch_backend must be selenium or http in config file!"
+                    elif not self.browser or "path_executable_chromedriver" in self.config and os.path.exists(
                             self.config["path_executable_chromedriver"]):
                         self.error = False
                     else:
@@ -120,24 +253,91 @@ class UOC:
 
         return value
 
-    def login_UOC(self):
+    def is_classroom_url(self, url):
+        # False if the page was redirected (e.g. to login page)
+        url_parts = urlsplit(url)
+        classroom_parts = urlsplit(self.PAGE_CLASSROOM_UOC)
+        return url_parts.hostname == classroom_parts.hostname and url_parts.path == classroom_parts.path
+
+    def restore_session(self):
+        # reuse the session of a previous run if it's still valid (probe with the first classroom page)
+        if self.session_cache is None:
+            return False
+        from uoc_http import HttpFetcher
+        session = self.session_cache.load(self.username)
+        classroomIds = [classroomId for classroomId in self.classroomIds if classroomId in self.classroomId_subjectIds]
+        if session is None or len(classroomIds) == 0:
+            return False
+        self.campusSessionId = session["campusSessionId"]
+        http = HttpFetcher(session["cookies"], user_agent=session.get("user_agent", ""),
+                           timeout=self.get_page_timeout())
+        # probe inside the deadline of the run
+        http_timeout, retries = UOC.get_http_timeout(max(0.1, self.get_timeout(self.get_page_timeout())))
         try:
-            self.driver.get(self.PAGE_LOGIN_UOC)
-            # Esperar a que se cargue la página de inicio de sesión
-            username_field = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.NAME, "j_username")))
-            password_field = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.NAME, "j_password")))
-
-            # Ingresar las credenciales de inicio de sesión y enviar el formulario
-            username_field.send_keys(self.username)
-            password_field.send_keys(self.password)
-            password_field.send_keys(Keys.RETURN)
-
-            self.campusSessionId = self.get_cookie("campusSessionId")
-        except Exception as e:
-            self.error = True
-            self.errorMessage = "Error in login: " + str(e)
+            html, url = http.get(self.get_data_url(self.classroomId_subjectIds[classroomIds[0]], classroomIds[0]),
+                                 timeout=http_timeout, retries=retries)
+        except Exception:
+            html, url = "", ""
+        if not self.is_classroom_url(url):
+            # session expired
+            http.close()
+            self.campusSessionId = ""
+            self.session_cache.remove(self.username)
+            return False
+        # probe page used like a loaded page
+        self.page_cache.put(self.get_page_key(classroomIds[0]), ClassroomPage(html, url))
+        if self.fetch_backend == "http":
+            self.close_http()
+            self.http = http
+            self.quit_driver()
+        else:
+            http.close()
+            self.share_cookies(self.driver, session["cookies"])
+        return True
+
+    def login_UOC(self):
+        with self.metrics.span("login"):
+            if self.restore_session():
+                return
+            try:
+                from selenium.webdriver.common.keys import Keys
+                from selenium.webdriver.common.by import By
+                from selenium.webdriver.support.ui import WebDriverWait
+                from selenium.webdriver.support import expected_conditions as EC
+                from selenium.common.exceptions import TimeoutException
+                from uoc_http import HttpFetcher
+                self.driver.get(self.PAGE_LOGIN_UOC)
+                # Esperar a que se cargue la página de inicio de sesión
+                login_timeout = self.get_timeout(self.config.get("login_timeout", 10))
+                username_field = WebDriverWait(self.driver, login_timeout).until(
+                    EC.presence_of_element_located((By.NAME, "j_username")))
+                password_field = WebDriverWait(self.driver, login_timeout).until(
+                    EC.presence_of_element_located((By.NAME, "j_password")))
+
+                # Ingresar las credenciales de inicio de sesión y enviar el formulario
+                username_field.send_keys(self.username)
+                password_field.send_keys(self.password)
+                password_field.send_keys(Keys.RETURN)
+                # wait until the session cookie is set
+                try:
+                    WebDriverWait(self.driver, self.get_timeout(self.config.get("login_timeout", 10))).until(
+                        lambda driver: self.get_cookie("campusSessionId") != "")
+                except TimeoutException:
+                    pass
+
+                self.campusSessionId = self.get_cookie("campusSessionId")
+                if self.campusSessionId != "" and self.session_cache is not None:
+                    # save session for next runs
+                    self.session_cache.save(self.username, self.campusSessionId, self.driver.get_cookies(),
+                                            self.driver.execute_script("return navigator.userAgent;"))
+                if self.fetch_backend == "http" and self.campusSessionId != "":
+                    # pages with http client & the cookies of the browser, browser not needed anymore
+                    self.close_http()
+                    self.http = HttpFetcher.from_driver(self.driver, timeout=self.get_page_timeout())
+                    self.quit_driver()
+            except Exception as e:
+                self.error = True
+                self.errorMessage = "Error in login: " + str(e)
 
     def get_data_url(self, subjectId, classroomId):
         url = self.PAGE_CLASSROOM_UOC + f's={self.campusSessionId}' \
@@ -146,44 +346,287 @@ class UOC:
         return url
 
     def get_difference_days(self, date1, date2):
-        format = "%d/%m/%Y"
-        date1 = datetime.strptime(date1, format)
-        date2 = datetime.strptime(date2, format)
-        difference = date2 - date1
+        return get_difference_days(date1, date2)
+
+    def get_page_timeout(self, classroomId=None):
+        # timeout by classroom ([page_timeouts] in config) or default timeout (page_timeout)
+        page_timeouts = self.config.get("page_timeouts", dict())
+        if classroomId in page_timeouts:
+            return page_timeouts[classroomId]
+        return self.config.get("page_timeout", 10)
+
+    def start_deadline(self):
+        run_deadline = self.config.get("run_deadline")
+        self.deadline = time.monotonic() + run_deadline if run_deadline is not None else None
+
+    def get_remaining_time(self):
+        # seconds until the deadline of the run (None without run_deadline)
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def get_timeout(self, timeout, pending=1):
+        # timeout limited by the time left (split between pending classrooms)
+        remaining = self.get_remaining_time()
+        if remaining is None:
+            return timeout
+        return min(timeout, remaining / max(1, pending))
 
-        return difference.days
+    @staticmethod
+    def get_http_timeout(timeout):
+        # total seconds of a request (connect & read) & no retries of urllib3 (only redirects)
+        from urllib3 import Timeout, Retry
+        return Timeout(total=timeout), Retry(total=None, connect=0, read=0, status=0, other=0, redirect=5)
+
+    def get_page_budget(self, classroomId):
+        # seconds for a classroom: its timeout or its part of the time left (classrooms not loaded by worker)
+        pending = len([classroomId for classroomId in self.classroomIds if classroomId in self.classroomId_subjectIds
+                       and classroomId not in self.classroom_status
+                       and self.page_cache.get(self.get_page_key(classroomId)) is None])
+        workers = max(1, min(self.config.get("workers", 1), pending))
+        return self.get_timeout(self.get_page_timeout(classroomId), -(-pending // workers))
+
+    def load_data_page(self, data_url, classroomId=None, driver=None, timeout=None):
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import TimeoutException
+        driver = driver or self.driver
+        if timeout is None:
+            timeout = self.get_page_timeout(classroomId)
+        start = time.monotonic()
+        if self.deadline is not None:
+            # with deadline the load of the page is also limited
+            driver.set_page_load_timeout(max(1, timeout))
+        driver.get(data_url)
+        if self.deadline is not None:
+            timeout = max(0.1, timeout - (time.monotonic() - start))
+        # Esperar a que se cargue el contenido dinámico (timeline & messages)
+        wait = WebDriverWait(driver, timeout, poll_frequency=0.2)
+        page_ready = PageReady()
+        try:
+            wait.until(page_ready)
+        except TimeoutException:
+            if page_ready.last_counters is None or page_ready.last_counters[3] == 0:
+                raise PageTimeout(f"Page not loaded after {timeout:.1f}s")
+            # classroom page loaded (e.g. without timeline), parsed with what it has
+            print(f"Page not ready after {timeout:.1f}s: {classroomId}")
+        self.page_load_times[classroomId if classroomId is not None else data_url] = time.monotonic() - start
+
+    def get_page(self, data_url, classroomId=None, driver=None, timeout=None):
+        with self.metrics.span("page_load", classroomId=classroomId):
+            if self.http is not None:
+                start = time.monotonic()
+                # retries in load_classroom_page (inside the time of the classroom)
+                http_timeout, retries = UOC.get_http_timeout(timeout or self.get_page_timeout(classroomId))
+                html, url = self.http.get(data_url, timeout=http_timeout, retries=retries)
+                if not self.is_classroom_url(url):
+                    raise ValueError("Session expired (redirected to another page)")
+                self.page_load_times[classroomId if classroomId is not None else data_url] = \
+                    time.monotonic() - start
+                self.metrics.count("page_loads", backend="http")
+            else:
+                # load page & get the html once (no more calls to the driver)
+                driver = driver or self.driver
+                self.load_data_page(data_url, classroomId, driver, timeout)
+                html, url = driver.page_source, driver.current_url
+                self.metrics.count("page_loads", backend="selenium")
+        self.metrics.count("html_bytes", len(html.encode("UTF-8")))
+        with self.metrics.span("parse", classroomId=classroomId):
+            return ClassroomPage(html, url)
+
+    def get_page_key(self, classroomId):
+        return classroomId, self.classroomId_subjectIds[classroomId], self.campusSessionId
+
+    def get_classroom_page(self, classroomId):
+        # page from cache or load it (None if error loading page)
+        key = self.get_page_key(classroomId)
+        page = self.page_cache.get(key)
+        if page is None:
+            self.load_pages()
+            page = self.page_cache.get(key)
+        if page is None and classroomId not in self.page_errors:
+            try:
+                page = self.load_classroom_page(classroomId)
+                self.page_cache.put(key, page)
+            except Exception as err:
+                self.page_errors[classroomId] = str(err)
+        if page is None:
+            print(f"Error loading classroom {classroomId}: {self.page_errors[classroomId]}")
+        elif classroomId not in self.classroom_status:
+            self.classroom_status[classroomId] = "ok"
+        return page
 
-    def load_data_page(self, data_url):
-        self.driver.get(data_url)
-        # Esperar a que se cargue el contenido dinámico
-        wait = WebDriverWait(self.driver, 10)
-        wait.until(EC.presence_of_element_located((By.ID, 'container')))
-        # extra time 3s
-        time.sleep(3)
+    @staticmethod
+    def is_timeout(err):
+        # timeout of selenium, urllib3 (also inside MaxRetryError) or the page
+        return isinstance(err, PageTimeout) or "timeout" in type(err).__name__.lower() or \
+            "timeout" in type(getattr(err, "reason", None)).__name__.lower()
+
+    def load_classroom_page(self, classroomId, driver=None):
+        # page with retries (page_retries, waiting page_retry_backoff * 2^retry seconds) in the time of the classroom
+        data_url = self.get_data_url(self.classroomId_subjectIds[classroomId], classroomId)
+        retries = self.config.get("page_retries", 1)
+        retry = 0
+        while True:
+            timeout = self.get_page_budget(classroomId)
+            if timeout <= 0:
+                self.classroom_status[classroomId] = "timed-out"
+                raise PageTimeout("Run deadline exceeded")
+            try:
+                page = self.get_page(data_url, classroomId, driver, timeout)
+                self.classroom_status[classroomId] = "ok"
+                return page
+            except ValueError:
+                # session expired, same result in next retries
+                self.classroom_status[classroomId] = "failed"
+                raise
+            except Exception as err:
+                if retry >= retries:
+                    self.classroom_status[classroomId] = "timed-out" if UOC.is_timeout(err) else "failed"
+                    raise
+                retry += 1
+                wait = self.config.get("page_retry_backoff", 1) * 2 ** (retry - 1) * random.uniform(0.8, 1.2)
+                print(f"Error loading classroom {classroomId}: {err} (retry {retry} of {retries})")
+                time.sleep(max(0, min(wait, self.get_remaining_time() or wait)))
+
+    def new_driver(self, account=None):
+        # browser of the browser service (reused by account, new one without account) or private browser
+        from selenium import webdriver
+        with self.metrics.span("browser_start"):
+            options = get_chrome_options(self.browser_profile)
+            driver = None
+            if self.browser_service is not None and self.browser_service.is_available():
+                try:
+                    if account is None:
+                        driver = self.browser_service.new_session(options)
+                    else:
+                        driver = self.browser_service.get_driver(account, options)
+                        if driver is None:
+                            # browser of the account used by another process, temporary browser
+                            driver = self.browser_service.new_session(options)
+                        else:
+                            driver.from_service = True
+                except Exception as err:
+                    print(f"Error in browser service, using own browser: {err}")
+            if driver is None:
+                driver = webdriver.Chrome(executable_path=self.config["path_executable_chromedriver"],
+                                          options=options)
+            block_urls(driver, self.browser_profile)
+        return self.metrics.instrument_driver(driver)
+
+    def share_cookies(self, driver, cookies=None):
+        # copy cookies of the login to another browser (only cookies for the classroom pages domain)
+        if cookies is None:
+            cookies = self.driver.get_cookies()
+        host = urlsplit(self.PAGE_CLASSROOM_UOC).hostname
+        driver.get(urljoin(self.PAGE_CLASSROOM_UOC, "/"))
+        for cookie in cookies:
+            domain = cookie.get("domain", host).lstrip(".")
+            if host == domain or host.endswith("." + domain):
+                driver.add_cookie({key: value for key, value in cookie.items() if key != "sameSite"})
+
+    def load_pages(self):
+        # load pages not in cache with several workers (config workers), errors only affect its classroom.
+        # Classrooms with error are not loaded again until invalidate_pages (once per run)
+        pending = [classroomId for classroomId in self.classroomIds if classroomId in self.classroomId_subjectIds
+                   and classroomId not in self.page_errors and classroomId not in self.classroom_status
+                   and self.page_cache.get(self.get_page_key(classroomId)) is None]
+        workers = min(self.config.get("workers", 1), len(pending))
+        if workers <= 1:
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        # each worker with its own browser (http client is shared), browsers reused in next calls
+        drivers = queue.Queue()
+        if self.http is None:
+            drivers.put(self.driver)
+            if self.worker_session != self.campusSessionId:
+                # login again: cookies of the new session
+                for driver in list(self.worker_drivers):
+                    try:
+                        self.share_cookies(driver)
+                    except Exception as err:
+                        print(f"Error in browser of worker: {err}")
+                        self.worker_drivers.remove(driver)
+                        try:
+                            driver.quit()
+                        except Exception:
+                            pass
+                self.worker_session = self.campusSessionId
+            while len(self.worker_drivers) < workers - 1:
+                try:
+                    driver = self.new_driver()
+                    self.share_cookies(driver)
+                    self.worker_drivers.append(driver)
+                except Exception as err:
+                    print(f"Error creating browser for worker: {err}")
+                    break
+            for driver in self.worker_drivers[:workers - 1]:
+                drivers.put(driver)
+
+        def load(classroomId):
+            driver = drivers.get() if self.http is None else None
+            try:
+                return self.load_classroom_page(classroomId, driver)
+            finally:
+                if driver is not None:
+                    drivers.put(driver)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(classroomId, executor.submit(load, classroomId)) for classroomId in pending]
+            # same order as classroomIds
+            for classroomId, future in futures:
+                try:
+                    self.page_cache.put(self.get_page_key(classroomId), future.result())
+                except Exception as err:
+                    self.page_errors[classroomId] = str(err)
+
+    def invalidate_pages(self, classroomId=None):
+        # force reload of the pages (all or one classroom)
+        self.page_cache.invalidate(classroomId)
+        if classroomId is None:
+            self.page_errors.clear()
+            self.classroom_status.clear()
+        else:
+            self.page_errors.pop(classroomId, None)
+            self.classroom_status.pop(classroomId, None)
+
+    def get_stale_data(self, classroomId, key):
+        # timeline (activities) or messages (forums) of a classroom not loaded in this run, from the last scrape
+        snapshot = self.read_snapshot()
+        if key == "timeline":
+            today = UOC.get_today_spain()
+            data = {activity["activity_id"]: Activity.from_dict(activity, today)
+                    for activity in snapshot.get("timeline", list()) if activity["classroomId"] == classroomId}
+        else:
+            data = snapshot.get("messages", dict()).get(classroomId, list())
+        if len(data) > 0:
+            self.classroom_status[classroomId] = "stale-from-cache"
+            print(f"Using {key} of the last scrape ({UOC.get_classroom_date(snapshot, classroomId, key)}): "
+                  f"{classroomId}")
+        return data
 
-    def get_messages(self):
+    @staticmethod
+    def get_classroom_date(snapshot, classroomId, key):
+        # date of the last scrape with data of the classroom (old snapshots: date of the whole scrape)
+        dates = snapshot.get("classroom_dates", dict()).get(classroomId, dict())
+        return dates.get(key, snapshot.get(key + "_date", ""))
+
+    def get_messages(self, notify=True):
         messages = dict()
         for classroomId in self.classroomIds:
             classroom_name = self.classroomId_names[classroomId]
             if classroomId in self.classroomId_subjectIds.keys():
-                subjectId = self.classroomId_subjectIds[classroomId]
-                data_url = self.get_data_url(subjectId, classroomId)
-                self.load_data_page(data_url)
+                page = self.get_classroom_page(classroomId)
+                if page is None:
+                    forums = self.get_stale_data(classroomId, "messages")
+                    if len(forums) > 0:
+                        messages[classroomId] = forums
+                    continue
                 # get messages
-                a_elements = self.driver.find_elements(By.CSS_SELECTOR, ".marcadors.LaunchesOWin")
                 nuevos = False
                 message_title = f"Messages in {classroom_name}:"
-                for a_element in a_elements:
-                    link = a_element.get_attribute("href")
-                    nombre = a_element.get_attribute("data-bocamoll-object-description")
-                    span_elements = a_element.find_elements(By.CSS_SELECTOR, ".new")
-                    mensajes_nuevos = 0
-                    mensajes_todos = 0
-                    if len(span_elements) == 1:
-                        mensajes_nuevos = span_elements[0].text
-                    span_elements = a_element.find_elements(By.CSS_SELECTOR, ".all")
-                    if len(span_elements) == 1:
-                        mensajes_todos = span_elements[0].text
+                with self.metrics.span("extract_messages", classroomId=classroomId):
+                    forums = extract_messages(page)
+                for nombre, link, mensajes_nuevos, mensajes_todos in forums:
                     # save information in dict
                     if classroomId not in messages:
                         messages[classroomId] = list()
@@ -191,267 +634,253 @@ class UOC:
                     if int(mensajes_nuevos) > 0:
                         message_content = f"{nombre}: {mensajes_nuevos} of {mensajes_todos}"
                         nuevos = True
-                        UOC.show_toast(message_title, message_content)
+                        if notify:
+                            self.notify(classroomId, message_title, message_content)
                 if not nuevos:
                     message_content = "No new messages!"
                 print(message_title)
                 print(message_content)
         self.messages = messages
+        self.save_snapshot(messages=True)
+        if self.store is not None:
+            self.store.save_messages(messages)
+
+    def get_message_counters(self):
+        # {(classroomId, link): (nombre, nuevos, todos)}
+        counters = dict()
+        for classroomId, forums in self.messages.items():
+            for nombre, link, mensajes_nuevos, mensajes_todos in forums:
+                counters[(classroomId, link)] = (nombre, int(mensajes_nuevos), int(mensajes_todos))
+        return counters
+
+    def watch_messages(self, interval=60, max_interval=900, iterations=None):
+        # poll messages with the same session & notify only counters that increased,
+        # wait more (up to max_interval) while nothing changes or there are errors
+        # counters already shown (get_messages before watching)
+        previous = self.get_message_counters()
+        wait = interval
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            iteration += 1
+            # messages were just loaded, wait before each poll (jitter +-20%)
+            time.sleep(wait * random.uniform(0.8, 1.2))
+            changed = False
+            try:
+                self.invalidate_pages()
+                self.start_deadline()
+                self.get_messages(notify=False)
+                if len(self.page_errors) > 0 and "ok" not in self.classroom_status.values():
+                    # all pages with error (e.g. session expired), login again for next poll
+                    self.campusSessionId = ""
+                    self.close_http()
+                    self.login_UOC()
+                counters = self.get_message_counters()
+                for key, (nombre, mensajes_nuevos, mensajes_todos) in counters.items():
+                    previous_nuevos = previous[key][1] if key in previous else 0
+                    if mensajes_nuevos > previous_nuevos:
+                        classroom_name = self.classroomId_names[key[0]]
+                        self.notify(key[0], f"Messages in {classroom_name}:",
+                                    f"{nombre}: {mensajes_nuevos} of {mensajes_todos}")
+                changed = counters != previous and len(self.page_errors) == 0
+                if len(counters) > 0:
+                    previous = counters
+            except Exception as err:
+                print(f"Error watching messages: {err}")
+            if changed:
+                wait = interval
+            else:
+                wait = min(wait * 2, max_interval)
+
+    def notify(self, classroomId, title, content):
+        # sent in background (joined by classroom, rate limit), [notifications] in config
+        if self.notifier is None:
+            notifications = self.config.get("notifications", dict())
+            self.notifier = NotificationDispatcher(self.notification_sinks, notifications.get("window", 5),
+                                                   notifications.get("max_queue", 100),
+                                                   notifications.get("rate_limit", 5),
+                                                   notifications.get("rate_period", 60))
+        self.notifier.notify(classroomId, title, content)
+
+    def close_notifier(self):
+        # send pending notifications
+        if self.notifier is not None:
+            self.notifier.close()
+            self.notifier = None
 
     @staticmethod
     def show_toast(title, content, duration=10):
-        notification.notify(
-            title=title,
-            message=content,
-            app_name='Timeline UOC',
-            # app_icon=os.path.abspath('images/icon_uoc.png'),
-            timeout=duration
-        )
+        PlyerSink(duration).send(title, content)
 
     def get_timeline(self):
         timelines = dict()
-        date_today_spain = UOC.get_date_spain()
+        date_today_spain = UOC.get_today_spain()
         for classroomId in self.classroomIds:
             classroom_name = self.classroomId_names[classroomId]
             if classroomId in self.classroomId_subjectIds.keys():
                 subjectId = self.classroomId_subjectIds[classroomId]
                 data_url = self.get_data_url(subjectId, classroomId)
-                self.load_data_page(data_url)
+                page = self.get_classroom_page(classroomId)
+                if page is None:
+                    timelines.update(self.get_stale_data(classroomId, "timeline"))
+                    continue
                 # get timeline
-                divs = self.driver.find_elements(By.CLASS_NAME, "tl-placeholder")
-                if len(divs) == 2:
-                    # only in second div
-                    try:
-                        divs_inside = divs[1].find_elements(By.CLASS_NAME, "tl-line")
-                        for div_inside in divs_inside:
-                            h2_element = div_inside.find_element(By.TAG_NAME, "h2")
-                            tipo = h2_element.text
-                            if tipo != "":
-                                a_elements = div_inside.find_elements(By.TAG_NAME, "a")
-                                for a_element in a_elements:
-                                    # Search inside each a element
-                                    texto_entero = a_element.get_attribute("title")
-                                    patron = r"\d{2}/\d{2}/\d{4}"
-                                    fechas = re.findall(patron, texto_entero)
-                                    # datetime.strptime(fecha, "%d/%m/%Y")
-                                    lista_fechas = [fecha for fecha in fechas]
-                                    if len(lista_fechas) == 2:
-                                        texto = texto_entero.split(" Inicio:")[0]
-                                        inicio = lista_fechas[0]
-                                        entrega = lista_fechas[1]
-                                        activity_url = a_element.get_attribute("href")
-                                        a_class = a_element.get_attribute("class")
-                                        activity_name = a_element.get_attribute("aria-label")
-                                        activity_name = activity_name.split(". Inicio:")[0]
-                                        completed = "completed" in a_class
-                                        activity_id = a_element.get_attribute("data-id")
-                                        dias_diferencia = self.get_difference_days(date_today_spain, entrega)
-
-                                        # put into timeline variable
-                                        timelines[activity_id] = {
-                                            "inicio": inicio,
-                                            "entrega": entrega,
-                                            "activity_id": activity_id,
-                                            "activity_url": activity_url,
-                                            "activity_name": activity_name,
-                                            "classroomId": classroomId,
-                                            "classroom_name": classroom_name,
-                                            "subjectId": subjectId,
-                                            "classroom_url": data_url,
-                                            "type": tipo,
-                                            "completed": completed,
-                                            "days": dias_diferencia
-                                        }
-                                    else:
-                                        print("Error timeline: Not found dates")
-                            else:
-                                print("Error timeline: Not found type activity")
-                    except Exception as err:
-                        print("Error timeline: Some error extracting info")
-                        print(err)
-                        pass
+                with self.metrics.span("extract_timeline", classroomId=classroomId):
+                    timelines.update(extract_timeline(page, classroomId, classroom_name, subjectId, data_url,
+                                                      date_today_spain))
 
         self.timeline = timelines
+        self.save_snapshot(timeline=True)
+        if self.store is not None:
+            self.store.save_activities(self.timeline.values())
 
-    def get_sorted_timeline(self, field_name):
-        def convertir_fecha(fecha):
-            return datetime.strptime(fecha, "%d/%m/%Y")
+    def get_sorted_activities(self, *keys):
+        # e.g. get_sorted_activities("completed", "entrega", "-days")
+        return sort_activities(self.timeline.values(), *keys)
 
-        field_type_date = ["inicio", "entrega"]
-        if field_name in field_type_date:
-            return sorted(self.timeline.items(), key=lambda x: convertir_fecha(x[1][field_name]))
+    def get_grouped_activities(self, key, *sort_keys):
+        # e.g. get_grouped_activities("classroom", "entrega")
+        return group_activities(self.get_sorted_activities(*sort_keys), key)
 
-        return sorted(self.timeline.items(), key=lambda x: x[1][field_name])
+    def get_sorted_timeline(self, field_name):
+        # old api: list of (activity_id, activity), activity can be used like the old dict
+        return [(activity.activity_id, activity) for activity in self.get_sorted_activities(field_name)]
 
     @staticmethod
-    def get_date_spain():
+    def get_today_spain():
+        import pytz
         timezone = "Europe/Madrid"
         now_utc = datetime.now(tz=pytz.utc)
         now_local = now_utc.astimezone(pytz.timezone(timezone))
+
+        return now_local.date()
+
+    @staticmethod
+    def get_date_spain():
         format = "%d/%m/%Y"
-        now_local_str = now_local.strftime(format)
+        now_local_str = UOC.get_today_spain().strftime(format)
 
         return now_local_str
 
     @staticmethod
     def get_span_code(text, background_color, color="#000", link=""):
-        get_span_code = ""
-        if link != "":
-            get_span_code = f'<a href="{link}" target="_blank">'
-        get_span_code += f'<span class="badge" style="background-color: {background_color}; color: {color}">{text}</span>'
-        if link != "":
-            get_span_code += '</a>'
-
-        return get_span_code
+        return get_span_code(text, background_color, color, link)
 
     def rgb_to_hex(r, g, b):
         return '#{:02x}{:02x}{:02x}'.format(r, g, b)
 
     def get_timeline_html(self, sorted_by="inicio", create_csv=False):
         self.get_timeline()
-        elements_timeline = self.get_sorted_timeline(sorted_by)
-        content_csv = list()
-        table_html = '<table id="timeline">' \
-                     '<tr>' \
-                     '<th>Nombre actividad</th>' \
-                     '<th>Asignatura</th>' \
-                     '<th>Tipo</th>' \
-                     '<th>Days reminder</th>' \
-                     '<th>Inicio</th>' \
-                     '<th>Final</th>' \
-                     '<th>Completada</th>' \
-                     '</tr>'
-
-        for el in elements_timeline:
-            classroomId = el[1]["classroomId"]
-            classroom_name = el[1]["classroom_name"]
-            classroom_url = el[1]["classroom_url"]
-            type = el[1]["type"]
-            days = el[1]["days"]
-            inicio = el[1]["inicio"]
-            entrega = el[1]["entrega"]
-            completed = el[1]["completed"]
-            activity_name = el[1]["activity_name"]
-            activity_url = el[1]["activity_url"]
-            activity_id = el[1]["activity_id"]
-            days_for_activty = self.get_difference_days(inicio, entrega)
-            # get codes
-            days_code = '<label for="' + str(activity_id) + '_time">' + str(
-                days) + '&nbsp;</label><progress id="' + str(activity_id) + '_time" value="' + str(
-                days) + '" max="' + str(days_for_activty) + '"></progress>'
-            activity_name_code = UOC.get_span_code(activity_name, background_color=self.get_color(classroomId),
-                                                   link=activity_url)
-            classroom_name_code = UOC.get_span_code(classroom_name, background_color=self.get_color(classroomId),
-                                                    link=classroom_url)
-            type_code = UOC.get_span_code(type, background_color=UOC.get_type_color(type), color="#FFF")
-            completed_image = './images/ko.png'
-            if completed:
-                completed_image = './images/ok.png'
-            completed_code = f'<img src="{completed_image}" border="0" width="24" />'
-            table_html += f'<tr><td align="left">{activity_name_code}</td>' \
-                          f'<td>{classroom_name_code}</td>' \
-                          f'<td>{type_code}</td>' \
-                          f'<td>{days_code}</td>' \
-                          f'<td>{inicio}</td>' \
-                          f'<td>{entrega}</td>' \
-                          f'<td>{completed_code}</td></tr>'
-            content_csv.append([activity_name, classroom_name, type, days, inicio, entrega, completed])
-        if create_csv:
-            # create csv & ical files
-            UOC.create_csv(content_csv)
-            UOC.create_ical()
-
-        table_html += '</table>'
-        html = '''<!DOCTYPE html>
-<html lang="en">
-  <head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <meta http-equiv="X-UA-Compatible" content="ie=edge">
-    <title>My timeline UOC</title>
-    <link rel="stylesheet" href="./style.css">
-    <link rel="icon" href="./favicon.ico" type="image/x-icon">
-  </head>
-  <body>
-  <h2>Timeline ''' + str(UOC.get_date_spain()) + '''</h2>''' + table_html + '''
-  </body>
-</html>'''
-        # Create timeline html
-        f = open("timeline.html", "w", encoding='UTF-8')
-        f.write(html)
-        f.close()
-        print("Timeline html created!")
-
-    @staticmethod
-    def create_csv(content_csv):
-        archivo_csv = open('timeline.csv', mode='w', newline='', encoding='UTF-8')
-        # Crear el objeto writer para escribir los datos en el archivo CSV
-        writer = csv.writer(archivo_csv, delimiter=',')
-        # write header
-        writer.writerow(["Activity name", "Classroom name", "Activity type", "Days", "Start", "End", "Completed"])
-        for contenido in content_csv:
-            writer.writerow(contenido)
-
-        archivo_csv.close()
-        print("Timeline csv created!")
+        self.render_timeline(sorted_by, create_csv)
+
+    def render_timeline(self, sorted_by="inicio", create_csv=False):
+        # files from self.timeline (scraped or loaded from snapshot)
+        # html always, csv, ics & json with create_csv
+        formats = TimelineExporter.FORMATS if create_csv else ("html",)
+        exporter = self.get_exporter(sorted_by, formats)
+        with self.metrics.span("write_files"):
+            exporter.write(UOC.get_date_spain())
+
+    def get_exporter(self, sorted_by="inicio", formats=TimelineExporter.FORMATS, countdown=True, stamp=None):
+        # exporter with all activities added (contents with get_contents or files with write)
+        exporter = TimelineExporter(self.config.get("output_dir", "."), formats, countdown, stamp)
+        with self.metrics.span("render"):
+            for activity_id, activity in self.get_sorted_timeline(sorted_by):
+                exporter.add(activity, self.get_color(activity.classroomId))
+        return exporter
+
+    def save_snapshot(self, timeline=False, messages=False):
+        # last scrape saved (config snapshot, "" to disable) to render files without browser
+        path = self.config.get("snapshot", ".uoc_snapshot.json")
+        if path == "":
+            return
+        snapshot = self.read_snapshot()
+        if timeline:
+            self.set_snapshot_dates(snapshot, "timeline")
+            records = [activity.as_dict() for activity in self.timeline.values()]
+            # date of the last change of the activities (feeds), days to the end change each day
+            if UOC.get_snapshot_records(records) != UOC.get_snapshot_records(snapshot.get("timeline", list())) \
+                    or "timeline_changed_date" not in snapshot:
+                snapshot["timeline_changed_date"] = UOC.get_date_spain()
+            snapshot["timeline"] = records
+        if messages:
+            self.set_snapshot_dates(snapshot, "messages")
+            snapshot["messages"] = self.messages
+        write_file(path, json.dumps(snapshot, ensure_ascii=False).encode("UTF-8"))
 
     @staticmethod
-    def create_ical():
-        # Abrir el archivo CSV y leer los datos
-        with open('timeline.csv', newline='', encoding='utf-8') as archivo_csv:
-            lector_csv = csv.reader(archivo_csv, delimiter=',')
-            datos = list(lector_csv)
-            # quitamos linea cabecera
-            datos = datos[1:]
-
-        # Crear el objeto de calendario iCal
-        calendario = Calendar()
-
-        # Iterar sobre los datos y crear un evento para cada fila
-        for fila in datos:
-            evento = Event()
-
-            # Configurar el nombre y la descripción del evento
-            evento.add('summary', fila[1] + " -> " + fila[2])
-            evento.add('description', fila[0] + " -> " + fila[3] + " days")
-
-            # Convertir la fecha y la hora de inicio y fin a objetos datetime
-            inicio = datetime.strptime(fila[4], '%d/%m/%Y')
-            fin = datetime.strptime(fila[5], '%d/%m/%Y')
-
-            # Establecer la hora de inicio del día y la hora final de 23:59:59
-            inicio = datetime.combine(inicio.date(), timed.min)
-            fin = datetime.combine(fin.date(), timed.max) - timedelta(microseconds=1)
-
-            # Configurar la fecha y hora de inicio y fin del evento
-            evento.add('dtstart', inicio)
-            evento.add('dtend', fin)
-
-            # Agregar el evento al calendario
-            calendario.add_component(evento)
-
-        # Escribir el calendario iCal a un archivo
-        with open('timeline.ics', 'wb') as archivo_ical:
-            archivo_ical.write(calendario.to_ical())
-
-        print("Timeline ics created!")
+    def get_snapshot_records(records):
+        return sorted(json.dumps({field: value for field, value in record.items() if field != "days"},
+                                 sort_keys=True) for record in records)
+
+    def set_snapshot_dates(self, snapshot, key):
+        # today only for the classrooms loaded in this run, stale classrooms keep the date of their data
+        today = UOC.get_date_spain()
+        classroom_dates = snapshot.setdefault("classroom_dates", dict())
+        for classroomId, status in self.classroom_status.items():
+            dates = classroom_dates.setdefault(classroomId, dict())
+            if status == "ok":
+                dates[key] = today
+            elif status == "stale-from-cache":
+                dates[key] = UOC.get_classroom_date(snapshot, classroomId, key)
+        if "ok" in self.classroom_status.values() or key + "_date" not in snapshot:
+            snapshot[key + "_date"] = today
+
+    def read_snapshot(self):
+        path = self.config.get("snapshot", ".uoc_snapshot.json")
+        if path == "" or not os.path.exists(path):
+            return dict()
+        with open(path, "r", encoding="UTF-8") as f:
+            return json.load(f)
+
+    def load_snapshot(self):
+        # timeline & messages of the last scrape (days recalculated for today)
+        snapshot = self.read_snapshot()
+        if "timeline" not in snapshot:
+            self.error = True
+            self.errorMessage = "Snapshot not found, run scrape first!"
+            return False
+        today = UOC.get_today_spain()
+        self.timeline = {activity["activity_id"]: Activity.from_dict(activity, today)
+                         for activity in snapshot["timeline"]}
+        self.messages = snapshot.get("messages", dict())
+        return True
+
+    def get_upcoming(self, days=7):
+        # activities not completed with end in the next days
+        return sort_activities([activity for activity in self.timeline.values()
+                                if not activity.completed and 0 <= activity.days <= days], "entrega", "inicio")
+
+    def get_changes(self, days=1):
+        # [(time, change, activity)] of the store in the last days (added, changed, completed, reopened)
+        if self.store is None:
+            self.error = True
+            self.errorMessage = "Parameter store_path not found in config file!"
+            return list()
+        return self.store.get_changes(time.time() - days * 86400, today=UOC.get_today_spain())
+
+    def get_classroom_status(self):
+        # {classroomId: (status, error)} of the classrooms loaded in this run
+        return {classroomId: (status, self.page_errors.get(classroomId, ""))
+                for classroomId, status in self.classroom_status.items()}
+
+    def write_metrics(self):
+        # json report (metrics_json) & prometheus textfile (metrics_prom)
+        if self.metrics.enabled:
+            if self.config.get("metrics_json", "metrics.json") != "":
+                self.metrics.write_json(self.config.get("metrics_json", "metrics.json"))
+            if self.config.get("metrics_prom", "") != "":
+                self.metrics.write_prometheus(self.config["metrics_prom"])
 
     @staticmethod
     def get_type_color(type_color):
-        # https://www.color-hex.com/
-        type_color = type_color.lower()
-        color = "#c8cdcd"  # default color (gray)
-        if "no evaluable" in type_color:
-            color = "#297630"  # green
-        if "pec" in type_color:
-            color = "#3d76da"  # blue
-        if "práctica" in type_color:
-            color = "#d20000"  # red
-
-        return color
+        return get_type_color(type_color)
 
     def __del__(self):
         try:
-            self.driver.quit()
+            self.close_http()
+            self.quit_driver()
+            self.close_notifier()
+            if self.store is not None:
+                self.store.close()
         except ImportError:
             pass
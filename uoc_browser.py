@@ -0,0 +1,216 @@
+import os
+import json
+import hashlib
+from uoc_export import write_file
+from uoc_session import FileLock
+
+# chrome profiles ([browser] in config), "default" is a normal visible chrome (like always)
+PROFILES = {
+    "default": {
+        "headless": False,
+        "page_load_strategy": "normal",
+        "block_images": False,
+        "block_css": False,
+        "blocked_urls": [],
+        "disk_cache_dir": "",
+        "window_size": ""
+    },
+    "lean": {
+        "headless": True,
+        "page_load_strategy": "eager",
+        "block_images": True,
+        "block_css": True,
+        "blocked_urls": ["*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar.com*",
+                         "*.woff", "*.woff2", "*.ttf"],
+        "disk_cache_dir": "",
+        "window_size": "1024,768"
+    }
+}
+IMAGE_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.webp", "*.ico"]
+CSS_PATTERNS = ["*.css"]
+
+
+def get_browser_profile(config):
+    # profile selected in [browser] & options of [browser] that change it
+    browser = config.get("browser", dict())
+    name = browser.get("profile", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Browser profile {name} not found (profiles: {', '.join(PROFILES)})")
+    profile = dict(PROFILES[name])
+    for option, value in browser.items():
+        if option != "profile":
+            if option not in profile:
+                raise ValueError(f"Browser option {option} not found")
+            profile[option] = value
+    if profile["page_load_strategy"] not in ("normal", "eager", "none"):
+        raise ValueError("Browser option page_load_strategy must be normal, eager or none")
+    return profile
+
+
+def get_chrome_options(profile):
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.page_load_strategy = profile["page_load_strategy"]
+    if profile["headless"]:
+        # run in background & not use GPU
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+    if profile["window_size"] != "":
+        options.add_argument(f"--window-size={profile['window_size']}")
+    if profile["disk_cache_dir"] != "":
+        options.add_argument(f"--disk-cache-dir={profile['disk_cache_dir']}")
+    if profile["block_images"]:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    return options
+
+
+def get_blocked_urls(profile):
+    blocked_urls = list(profile["blocked_urls"])
+    if profile["block_images"]:
+        blocked_urls += IMAGE_PATTERNS
+    if profile["block_css"]:
+        blocked_urls += CSS_PATTERNS
+    return blocked_urls
+
+
+def block_urls(driver, profile):
+    # requests not needed by the extractors (url patterns with *) are cancelled by chrome
+    blocked_urls = get_blocked_urls(profile)
+    if len(blocked_urls) > 0:
+        driver.execute_cdp_cmd("Network.enable", dict())
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_urls})
+    return driver
+
+
+def get_service_driver_class():
+    # remote driver for a running chromedriver, can attach to a session created by another process
+    from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+    from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+
+    class ServiceDriver(RemoteWebDriver):
+        def __init__(self, url, options, session_id=None):
+            self.attach_session_id = session_id
+            executor = ChromiumRemoteConnection(url, vendor_prefix="goog", browser_name="chrome", keep_alive=True)
+            super().__init__(command_executor=executor, options=options)
+
+        def start_session(self, capabilities, browser_profile=None):
+            if self.attach_session_id is None:
+                super().start_session(capabilities, browser_profile)
+            else:
+                self.session_id = self.attach_session_id
+                self.caps = capabilities
+
+        def execute_cdp_cmd(self, cmd, cmd_args):
+            return self.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})["value"]
+
+    return ServiceDriver
+
+
+class BrowserService:
+    # sessions of a chromedriver already running (browser_service.py), one session (own chrome) by account,
+    # reused between runs & processes, recycled after max_uses or when it uses more than max_memory_mb.
+    # State file locked between processes & each session used by one process at a time (lease file)
+    def __init__(self, url, state_path=".uoc_browser_service.json", max_uses=50, max_memory_mb=500):
+        self.url = url.rstrip("/")
+        self.state_path = state_path
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        # {account: lease} of the sessions used by this process
+        self.leases = dict()
+
+    def is_available(self):
+        import urllib.request
+        try:
+            with urllib.request.urlopen(f"{self.url}/status", timeout=1) as response:
+                return json.load(response)["value"].get("ready", False)
+        except Exception:
+            return False
+
+    def read_state(self):
+        if not os.path.exists(self.state_path):
+            return dict()
+        try:
+            with open(self.state_path, "r", encoding="UTF-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    def write_state(self, state):
+        write_file(self.state_path, json.dumps(state).encode("UTF-8"))
+
+    @staticmethod
+    def get_memory_mb(user_data_dir):
+        # memory (rss) of the chrome of a session: browser process (--user-data-dir) & its children,
+        # 0 without psutil or if not found
+        try:
+            import psutil
+        except ImportError:
+            return 0
+        for process in psutil.process_iter(["cmdline"]):
+            cmdline = process.info["cmdline"] or list()
+            if f"--user-data-dir={user_data_dir}" in cmdline and not any(arg.startswith("--type=") for arg in cmdline):
+                try:
+                    processes = [process] + process.children(recursive=True)
+                    return sum(child.memory_info().rss for child in processes) / 1024 / 1024
+                except psutil.Error:
+                    return 0
+        return 0
+
+    def new_session(self, options):
+        return get_service_driver_class()(self.url, options)
+
+    def get_lease_path(self, account):
+        return f"{self.state_path}.{hashlib.sha1(account.encode('UTF-8')).hexdigest()[:12]}.lease"
+
+    def get_driver(self, account, options):
+        # browser of the account, None if it's used by another process
+        lease = FileLock(self.get_lease_path(account))
+        if not lease.acquire(blocking=False):
+            return None
+        try:
+            with FileLock(self.state_path + ".lock"):
+                driver = self.get_account_driver(account, options)
+        except Exception:
+            lease.release()
+            raise
+        self.leases[account] = lease
+        return driver
+
+    def get_account_driver(self, account, options):
+        state = self.read_state()
+        session = state.get(account)
+        driver = None
+        if session is not None:
+            try:
+                driver = get_service_driver_class()(self.url, options, session["session_id"])
+                # error if the session was closed (e.g. chromedriver restarted)
+                driver.current_url
+                if session["uses"] >= self.max_uses or \
+                        self.get_memory_mb(session.get("user_data_dir", "")) > self.max_memory_mb:
+                    # recycle session (new chrome)
+                    driver.quit()
+                    driver = None
+            except Exception:
+                driver = None
+        if driver is None:
+            driver = self.new_session(options)
+            session = {"session_id": driver.session_id, "uses": 0,
+                       "user_data_dir": driver.capabilities.get("chrome", dict()).get("userDataDir", "")}
+        session["uses"] += 1
+        state[account] = session
+        self.write_state(state)
+        return driver
+
+    def release(self, account):
+        # browser of the account free for other processes (browser kept open)
+        lease = self.leases.pop(account, None)
+        if lease is not None:
+            lease.release()
+
+    def remove(self, account):
+        with FileLock(self.state_path + ".lock"):
+            state = self.read_state()
+            if account in state:
+                del state[account]
+                self.write_state(state)
@@ -0,0 +1,189 @@
+import io
+import os
+import csv
+import json
+import hashlib
+import tempfile
+from datetime import date, datetime, time as timed, timedelta, timezone
+
+HTML_HEADER = '''<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <meta http-equiv="X-UA-Compatible" content="ie=edge">
+    <title>My timeline UOC</title>
+    <link rel="stylesheet" href="./style.css">
+    <link rel="icon" href="./favicon.ico" type="image/x-icon">
+  </head>
+  <body>
+  <h2>Timeline {date}</h2>'''
+HTML_TABLE_HEADER = '<table id="timeline">' \
+                    '<tr>' \
+                    '<th>Nombre actividad</th>' \
+                    '<th>Asignatura</th>' \
+                    '<th>Tipo</th>' \
+                    '<th>Days reminder</th>' \
+                    '<th>Inicio</th>' \
+                    '<th>Final</th>' \
+                    '<th>Completada</th>' \
+                    '</tr>'
+HTML_FOOTER = '''</table>
+  </body>
+</html>'''
+# umask of the process read once (changing it while other threads create files isn't safe)
+UMASK = os.umask(0)
+os.umask(UMASK)
+CSV_HEADER = ["Activity name", "Classroom name", "Activity type", "Days", "Start", "End", "Completed"]
+
+
+def get_span_code(text, background_color, color="#000", link=""):
+    get_span_code = ""
+    if link != "":
+        get_span_code = f'<a href="{link}" target="_blank">'
+    get_span_code += f'<span class="badge" style="background-color: {background_color}; color: {color}">{text}</span>'
+    if link != "":
+        get_span_code += '</a>'
+
+    return get_span_code
+
+
+def get_type_color(type_color):
+    # https://www.color-hex.com/
+    type_color = type_color.lower()
+    color = "#c8cdcd"  # default color (gray)
+    if "no evaluable" in type_color:
+        color = "#297630"  # green
+    if "pec" in type_color:
+        color = "#3d76da"  # blue
+    if "práctica" in type_color:
+        color = "#d20000"  # red
+
+    return color
+
+
+def write_file(path, content):
+    # write only if content changed (same hash), with temp file & rename (readers never see half file)
+    # returns True if file was written
+    if os.path.exists(path) and os.path.getsize(path) == len(content):
+        with open(path, "rb") as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(content).digest():
+                return False
+    directory = os.path.dirname(os.path.abspath(path))
+    # temp name not ended like the file (e.g. node_exporter reads all *.prom files)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        # same permissions as the old file (or default permissions), mkstemp creates it with 600
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        else:
+            os.chmod(tmp_path, 0o666 & ~UMASK)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return True
+
+
+class TimelineExporter:
+    # html, csv, ics & json of the timeline in a single pass over the activities
+    FORMATS = ("html", "csv", "ics", "json")
+
+    def __init__(self, output_dir=".", formats=FORMATS, countdown=True, stamp=None):
+        # countdown=False: ics & json without days to the end (content only changes with a new scrape, feeds)
+        # stamp: DTSTAMP of the events (default today 00:00 UTC, same content all day)
+        self.output_dir = output_dir
+        self.formats = formats
+        self.countdown = countdown
+        self.stamp = stamp or datetime.combine(date.today(), timed.min, tzinfo=timezone.utc)
+        self.html_rows = [HTML_TABLE_HEADER]
+        self.csv_buffer = io.StringIO(newline="")
+        self.csv_writer = csv.writer(self.csv_buffer, delimiter=",")
+        self.csv_writer.writerow(CSV_HEADER)
+        self.calendar = None
+        if "ics" in self.formats:
+            # icalendar is slow to import, only when needed
+            from icalendar import Calendar, Event
+            self.calendar = Calendar()
+            # required by RFC 5545
+            self.calendar.add('prodid', '-//Timeline UOC//timeline-uoc//ES')
+            self.calendar.add('version', '2.0')
+            self.event_class = Event
+        self.records = list()
+
+    def add(self, activity, color):
+        activity_id = activity.activity_id
+        activity_name = activity.activity_name
+        classroom_name = activity.classroom_name
+        type = activity.type
+        days = activity.days
+        inicio = activity.inicio
+        entrega = activity.entrega
+        completed = activity.completed
+
+        if "html" in self.formats:
+            days_for_activty = activity.duration
+            days_code = f'<label for="{activity_id}_time">{days}&nbsp;</label>' \
+                        f'<progress id="{activity_id}_time" value="{days}" max="{days_for_activty}"></progress>'
+            activity_name_code = get_span_code(activity_name, background_color=color, link=activity.activity_url)
+            classroom_name_code = get_span_code(classroom_name, background_color=color,
+                                                link=activity.classroom_url)
+            type_code = get_span_code(type, background_color=get_type_color(type), color="#FFF")
+            completed_image = './images/ok.png' if completed else './images/ko.png'
+            completed_code = f'<img src="{completed_image}" border="0" width="24" />'
+            self.html_rows.append(f'<tr><td align="left">{activity_name_code}</td>'
+                                  f'<td>{classroom_name_code}</td>'
+                                  f'<td>{type_code}</td>'
+                                  f'<td>{days_code}</td>'
+                                  f'<td>{inicio}</td>'
+                                  f'<td>{entrega}</td>'
+                                  f'<td>{completed_code}</td></tr>')
+
+        if "csv" in self.formats:
+            self.csv_writer.writerow([activity_name, classroom_name, type, days, inicio, entrega, completed])
+
+        if "ics" in self.formats:
+            evento = self.event_class()
+            # same uid in each export, calendars update the event instead of adding a new one
+            evento.add('uid', f"{activity_id}@timeline-uoc")
+            evento.add('dtstamp', self.stamp)
+            evento.add('summary', f"{classroom_name} -> {type}")
+            evento.add('description', f"{activity_name} -> {days} days" if self.countdown else activity_name)
+            # Establecer la hora de inicio del día y la hora final de 23:59:59
+            evento.add('dtstart', datetime.combine(activity.start, timed.min))
+            evento.add('dtend', datetime.combine(activity.end, timed.max) - timedelta(microseconds=1))
+            self.calendar.add_component(evento)
+
+        if "json" in self.formats:
+            record = activity.as_dict()
+            if not self.countdown:
+                del record["days"]
+            self.records.append(record)
+
+    def get_contents(self, date_today):
+        contents = dict()
+        if "html" in self.formats:
+            contents["html"] = (HTML_HEADER.format(date=date_today) + "".join(self.html_rows) + HTML_FOOTER) \
+                .encode("UTF-8")
+        if "csv" in self.formats:
+            contents["csv"] = self.csv_buffer.getvalue().encode("UTF-8")
+        if "ics" in self.formats:
+            contents["ics"] = self.calendar.to_ical()
+        if "json" in self.formats:
+            contents["json"] = json.dumps({"date": date_today, "timeline": self.records}, ensure_ascii=False,
+                                          indent=2).encode("UTF-8")
+        return contents
+
+    def write(self, date_today, name="timeline"):
+        # returns {format: file written (False if not changed)}
+        written = dict()
+        for format, content in self.get_contents(date_today).items():
+            path = os.path.join(self.output_dir, f"{name}.{format}")
+            written[format] = write_file(path, content)
+            if written[format]:
+                print(f"Timeline {format} created!")
+            else:
+                print(f"Timeline {format} not changed")
+        return written
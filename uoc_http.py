@@ -0,0 +1,75 @@
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, urljoin
+import urllib3
+
+
+class HttpFetcher:
+    # fetch classroom pages without browser, with the cookies of the login (keep-alive & gzip)
+    def __init__(self, cookies, user_agent="", timeout=10, maxsize=4):
+        # cookies: list of dicts like driver.get_cookies()
+        self.cookies = list()
+        for cookie in cookies:
+            self.set_cookie(cookie["name"], cookie["value"], cookie.get("domain", ""), cookie.get("path", "/"))
+        self.timeout = timeout
+        self.headers = {"Accept-Encoding": "gzip, deflate"}
+        if user_agent != "":
+            self.headers["User-Agent"] = user_agent
+        self.http = urllib3.PoolManager(num_pools=4, maxsize=maxsize)
+
+    @staticmethod
+    def from_driver(driver, timeout=10, maxsize=4):
+        user_agent = driver.execute_script("return navigator.userAgent;")
+        return HttpFetcher(driver.get_cookies(), user_agent=user_agent, timeout=timeout, maxsize=maxsize)
+
+    def set_cookie(self, name, value, domain="", path="/"):
+        domain = domain.lstrip(".").lower()
+        self.cookies = [c for c in self.cookies if not (c["name"] == name and c["domain"] == domain)]
+        self.cookies.append({"name": name, "value": value, "domain": domain, "path": path or "/"})
+
+    def get_cookie(self, name):
+        value = ""
+        for cookie in self.cookies:
+            if cookie["name"] == name:
+                value = cookie["value"]
+        return value
+
+    def get_cookie_header(self, url):
+        # only cookies for the host & path of the url
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        path = parts.path or "/"
+        values = list()
+        for cookie in self.cookies:
+            domain = cookie["domain"]
+            if domain != "" and host != domain and not host.endswith("." + domain):
+                continue
+            if not path.startswith(cookie["path"]):
+                continue
+            values.append(f'{cookie["name"]}={cookie["value"]}')
+        return "; ".join(values)
+
+    def get(self, url, timeout=None, retries=None):
+        # returns (html, final url), retries=None: default retries of urllib3
+        headers = dict(self.headers)
+        cookie_header = self.get_cookie_header(url)
+        if cookie_header != "":
+            headers["Cookie"] = cookie_header
+        response = self.http.request("GET", url, headers=headers, timeout=timeout or self.timeout, retries=retries)
+        # keep cookies updated by the server
+        for set_cookie in response.headers.getlist("Set-Cookie"):
+            cookie = SimpleCookie()
+            cookie.load(set_cookie)
+            for morsel in cookie.values():
+                self.set_cookie(morsel.key, morsel.value, morsel["domain"] or urlsplit(url).hostname or "",
+                                morsel["path"])
+        if response.status >= 400:
+            raise urllib3.exceptions.HTTPError(f"HTTP error {response.status}: {url}")
+        charset = "UTF-8"
+        content_type = response.headers.get("Content-Type", "")
+        if "charset=" in content_type:
+            charset = content_type.split("charset=")[-1].split(";")[0].strip()
+        # url after redirects (can be relative)
+        return response.data.decode(charset, errors="replace"), urljoin(url, response.geturl() or url)
+
+    def close(self):
+        self.http.clear()
@@ -0,0 +1,124 @@
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from uoc_export import write_file
+
+NULL_SPAN = nullcontext()
+
+
+def get_prometheus_labels(labels):
+    if len(labels) == 0:
+        return ""
+    values = list()
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        values.append(f'{name}="{value}"')
+    return "{" + ",".join(values) + "}"
+
+
+class NullMetrics:
+    # metrics disabled (no overhead)
+    enabled = False
+
+    def span(self, name, **labels):
+        return NULL_SPAN
+
+    def count(self, name, value=1, **labels):
+        pass
+
+    def instrument_driver(self, driver):
+        return driver
+
+
+class Metrics:
+    # times by phase/classroom (spans) & counters (webdriver commands, page loads, html bytes)
+    enabled = True
+
+    def __init__(self, labels=None):
+        # labels added to all prometheus metrics (e.g. account in batch.py)
+        self.labels = tuple(sorted((labels or dict()).items()))
+        self.start = time.time()
+        self.spans = dict()
+        self.counters = dict()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            key = (name, tuple(sorted(labels.items())))
+            with self.lock:
+                total, count = self.spans.get(key, (0.0, 0))
+                self.spans[key] = (total + elapsed, count + 1)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def instrument_driver(self, driver):
+        # count each command sent to chromedriver
+        execute = driver.execute
+
+        def counted_execute(driver_command, params=None):
+            self.count("webdriver_commands", command=driver_command)
+            return execute(driver_command, params)
+
+        driver.execute = counted_execute
+        return driver
+
+    def get_span_seconds(self, name, **labels):
+        return self.spans.get((name, tuple(sorted(labels.items()))), (0.0, 0))[0]
+
+    def get_counter(self, name):
+        # total of a counter (all labels)
+        return sum(value for (counter_name, labels), value in self.counters.items() if counter_name == name)
+
+    def get_report(self):
+        with self.lock:
+            return {
+                "start": self.start,
+                "duration": time.time() - self.start,
+                "spans": [dict(labels, name=name, seconds=total, count=count)
+                          for (name, labels), (total, count) in self.spans.items()],
+                "counters": [dict(labels, name=name, value=value)
+                             for (name, labels), value in self.counters.items()]
+            }
+
+    def write_json(self, path):
+        write_file(path, json.dumps(self.get_report(), indent=2).encode("UTF-8"))
+
+    def get_prometheus(self):
+        # text format for node_exporter textfile collector
+        report = self.get_report()
+        run_labels = get_prometheus_labels(self.labels)
+        lines = ["# HELP uoc_run_timestamp_seconds Start of the run.",
+                 "# TYPE uoc_run_timestamp_seconds gauge",
+                 f"uoc_run_timestamp_seconds{run_labels} {report['start']:.3f}",
+                 "# HELP uoc_run_duration_seconds Duration of the run.",
+                 "# TYPE uoc_run_duration_seconds gauge",
+                 f"uoc_run_duration_seconds{run_labels} {report['duration']:.6f}"]
+        with self.lock:
+            spans = sorted(self.spans.items())
+            counters = sorted(self.counters.items())
+        lines += ["# HELP uoc_span_seconds Seconds by phase (and classroom).", "# TYPE uoc_span_seconds gauge"]
+        for (name, labels), (total, count) in spans:
+            lines.append(f"uoc_span_seconds{get_prometheus_labels(self.labels + (('span', name),) + labels)} "
+                         f"{total:.6f}")
+        lines += ["# HELP uoc_span_count Times each phase was run.", "# TYPE uoc_span_count gauge"]
+        for (name, labels), (total, count) in spans:
+            lines.append(f"uoc_span_count{get_prometheus_labels(self.labels + (('span', name),) + labels)} {count}")
+        last_name = None
+        for (name, labels), value in counters:
+            if name != last_name:
+                lines += [f"# HELP uoc_{name}_total Counter {name}.", f"# TYPE uoc_{name}_total counter"]
+                last_name = name
+            lines.append(f"uoc_{name}_total{get_prometheus_labels(self.labels + labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        write_file(path, self.get_prometheus().encode("UTF-8"))
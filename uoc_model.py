@@ -0,0 +1,122 @@
+from datetime import date, datetime
+
+DATE_FORMAT = "%d/%m/%Y"
+# dict fields of the timeline (old shape)
+FIELDS = ("inicio", "entrega", "activity_id", "activity_url", "activity_name", "classroomId", "classroom_name",
+          "subjectId", "classroom_url", "type", "completed", "days")
+# sort & group keys (also names of the old dict fields)
+SORT_KEYS = {
+    "inicio": lambda a: a.start,
+    "start": lambda a: a.start,
+    "entrega": lambda a: a.end,
+    "end": lambda a: a.end,
+    "due": lambda a: a.end,
+    "days": lambda a: a.days,
+    "duration": lambda a: a.duration,
+    "classroom": lambda a: a.classroom_name,
+    "classroom_name": lambda a: a.classroom_name,
+    "classroomId": lambda a: a.classroomId,
+    "subjectId": lambda a: a.subjectId,
+    "type": lambda a: a.type,
+    "completed": lambda a: a.completed,
+    "activity_name": lambda a: a.activity_name,
+    "name": lambda a: a.activity_name,
+    "activity_id": lambda a: a.activity_id,
+    "activity_url": lambda a: a.activity_url,
+    "classroom_url": lambda a: a.classroom_url,
+}
+
+
+def parse_date(text):
+    # "dd/mm/yyyy" -> date
+    return date(int(text[6:10]), int(text[3:5]), int(text[0:2]))
+
+
+class Activity:
+    # activity of the timeline, dates parsed once (start, end & today of extraction)
+    __slots__ = ("activity_id", "activity_url", "activity_name", "classroomId", "classroom_name", "subjectId",
+                 "classroom_url", "type", "completed", "start", "end", "today")
+
+    def __init__(self, activity_id, activity_url, activity_name, classroomId, classroom_name, subjectId,
+                 classroom_url, type, completed, start, end, today):
+        self.activity_id = activity_id
+        self.activity_url = activity_url
+        self.activity_name = activity_name
+        self.classroomId = classroomId
+        self.classroom_name = classroom_name
+        self.subjectId = subjectId
+        self.classroom_url = classroom_url
+        self.type = type
+        self.completed = completed
+        self.start = start
+        self.end = end
+        self.today = today
+
+    @property
+    def days(self):
+        # days until the end (negative if finished)
+        return (self.end - self.today).days
+
+    @property
+    def duration(self):
+        return (self.end - self.start).days
+
+    @property
+    def inicio(self):
+        return self.start.strftime(DATE_FORMAT)
+
+    @property
+    def entrega(self):
+        return self.end.strftime(DATE_FORMAT)
+
+    # compatibility with the old dict shape: activity["entrega"], activity.keys(), dict(activity)
+    def __getitem__(self, key):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in FIELDS
+
+    def keys(self):
+        return FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in FIELDS else default
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+    @staticmethod
+    def from_dict(activity, today=None):
+        if today is None:
+            today = datetime.now().date()
+        return Activity(activity["activity_id"], activity["activity_url"], activity["activity_name"],
+                        activity["classroomId"], activity["classroom_name"], activity["subjectId"],
+                        activity["classroom_url"], activity["type"], activity["completed"],
+                        parse_date(activity["inicio"]), parse_date(activity["entrega"]), today)
+
+    def __eq__(self, other):
+        return isinstance(other, Activity) and all(getattr(self, name) == getattr(other, name)
+                                                   for name in Activity.__slots__)
+
+    def __repr__(self):
+        return f"Activity({self.activity_id!r}, {self.activity_name!r}, {self.inicio} - {self.entrega})"
+
+
+def sort_activities(activities, *keys):
+    # sort by several keys, "-" before the key for reverse order, e.g. sort_activities(a, "completed", "-days")
+    activities = list(activities)
+    for key in reversed(keys):
+        reverse = key.startswith("-")
+        activities.sort(key=SORT_KEYS[key.lstrip("-")], reverse=reverse)
+    return activities
+
+
+def group_activities(activities, key):
+    # {value of key: [activities]} in the same order, key: classroom, type, due, completed, ...
+    groups = dict()
+    get_key = SORT_KEYS[key]
+    for activity in activities:
+        groups.setdefault(get_key(activity), list()).append(activity)
+    return groups
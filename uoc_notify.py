@@ -0,0 +1,160 @@
+import json
+import time
+import queue
+import atexit
+import threading
+
+# notifications sent by a background thread ([notifications] in config): scraping never waits for them,
+# notifications of the same classroom in a few seconds (window) are sent as one & at most rate_limit
+# notifications each rate_period seconds (the others wait & are joined with the next ones)
+STOP = object()
+
+
+class PlyerSink:
+    # desktop notification (toast)
+    def __init__(self, duration=10):
+        self.duration = duration
+
+    def send(self, title, content):
+        from plyer import notification
+        notification.notify(
+            title=title,
+            message=content,
+            app_name='Timeline UOC',
+            # app_icon=os.path.abspath('images/icon_uoc.png'),
+            timeout=self.duration
+        )
+
+
+class StdoutSink:
+    def send(self, title, content):
+        print(f"{title}\n{content}")
+
+
+class FileSink:
+    # one json line by notification
+    def __init__(self, path="notifications.log"):
+        self.path = path
+
+    def send(self, title, content):
+        with open(self.path, "a", encoding="UTF-8") as f:
+            f.write(json.dumps({"time": time.time(), "title": title, "content": content}, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    # POST json {title, content} (e.g. local server that forwards to the phone)
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, title, content):
+        import urllib.request
+        request = urllib.request.Request(self.url, json.dumps({"title": title, "content": content}).encode("UTF-8"),
+                                         {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def get_sinks(config):
+    # sinks of [notifications] (default plyer like always)
+    sinks = list()
+    for name in config.get("sinks", ["plyer"]):
+        if name == "plyer":
+            sinks.append(PlyerSink(config.get("duration", 10)))
+        elif name == "stdout":
+            sinks.append(StdoutSink())
+        elif name == "file":
+            sinks.append(FileSink(config.get("file", "notifications.log")))
+        elif name == "webhook":
+            if config.get("webhook_url", "") == "":
+                raise ValueError("Parameter webhook_url not found in [notifications]")
+            sinks.append(WebhookSink(config["webhook_url"]))
+        else:
+            raise ValueError(f"Notification sink {name} not found (sinks: plyer, stdout, file, webhook)")
+    return sinks
+
+
+class NotificationDispatcher:
+    def __init__(self, sinks, window=5.0, max_queue=100, rate_limit=5, rate_period=60.0):
+        self.sinks = sinks
+        self.window = window
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.queue = queue.Queue(maxsize=max_queue)
+        # {classroomId: (first time, title, [contents])}
+        self.pending = dict()
+        # times of the last notifications sent (rate limit)
+        self.sent_times = list()
+        self.dropped = 0
+        self.sent = 0
+        self.thread = threading.Thread(target=self.run, name="notifications", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def notify(self, classroomId, title, content):
+        # never waits: if the queue is full the notification is lost
+        try:
+            self.queue.put_nowait((classroomId, title, content))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self.queue.get(timeout=self.get_wait())
+                if item is STOP:
+                    stop = True
+                else:
+                    self.add(*item)
+            except queue.Empty:
+                pass
+            self.send_ready(force=stop)
+
+    def add(self, classroomId, title, content):
+        first, title, contents = self.pending.get(classroomId, (time.monotonic(), title, list()))
+        contents.append(content)
+        self.pending[classroomId] = (first, title, contents)
+
+    def get_wait(self):
+        # until the first pending classroom ends its window
+        if len(self.pending) == 0:
+            return None
+        now = time.monotonic()
+        wait = min(first for first, title, contents in self.pending.values()) + self.window - now
+        if wait <= 0 and not self.can_send():
+            # until the oldest notification leaves the rate period
+            wait = self.sent_times[0] + self.rate_period - now
+        return max(0.05, wait)
+
+    def can_send(self):
+        now = time.monotonic()
+        self.sent_times = [sent for sent in self.sent_times if now - sent < self.rate_period]
+        return len(self.sent_times) < self.rate_limit
+
+    def send_ready(self, force=False):
+        # force: all pending notifications (shutdown), without window & rate limit
+        now = time.monotonic()
+        for classroomId, (first, title, contents) in list(self.pending.items()):
+            if not force and (now - first < self.window or not self.can_send()):
+                continue
+            del self.pending[classroomId]
+            self.sent_times.append(now)
+            self.send(title, "\n".join(contents))
+
+    def send(self, title, content):
+        for sink in self.sinks:
+            try:
+                sink.send(title, content)
+            except Exception as err:
+                print(f"Error sending notification ({type(sink).__name__}): {err}")
+        self.sent += 1
+
+    def close(self, timeout=30):
+        # send pending notifications & stop the thread
+        if self.thread.is_alive():
+            self.queue.put(STOP)
+            self.thread.join(timeout)
+        atexit.unregister(self.close)
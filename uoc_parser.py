@@ -0,0 +1,213 @@
+import re
+import sys
+import time
+import json
+import argparse
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from uoc_model import Activity, parse_date
+
+# elements without closing tag
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+                 "track", "wbr"}
+# elements whose content is not visible text
+NO_TEXT_ELEMENTS = {"script", "style", "template", "noscript"}
+PATTERN_DATE = re.compile(r"\d{2}/\d{2}/\d{4}")
+PATTERN_SPACES = re.compile(r"\s+")
+
+
+class Element:
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag, attrs):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+
+    def get_attribute(self, name):
+        return self.attrs.get(name)
+
+    def has_class(self, *names):
+        classes = (self.attrs.get("class") or "").split()
+        return all(name in classes for name in names)
+
+    def iter(self):
+        # descendants in document order (like find_elements)
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Element):
+                yield node
+                stack.extend(reversed(node.children))
+
+    def find_elements_by_class(self, *names):
+        return [el for el in self.iter() if el.has_class(*names)]
+
+    def find_elements_by_tag(self, tag):
+        return [el for el in self.iter() if el.tag == tag]
+
+    @property
+    def text(self):
+        # text like selenium: whitespace collapsed and stripped
+        parts = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif node.tag not in NO_TEXT_ELEMENTS:
+                stack.extend(reversed(node.children))
+        return PATTERN_SPACES.sub(" ", "".join(parts)).strip()
+
+
+class PageParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Element("#document", {})
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag, {name: ("" if value is None else value) for name, value in attrs})
+        self.stack[-1].children.append(element)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(element)
+
+    def handle_startendtag(self, tag, attrs):
+        element = Element(tag, {name: ("" if value is None else value) for name, value in attrs})
+        self.stack[-1].children.append(element)
+
+    def handle_endtag(self, tag):
+        # close tag and all unclosed tags inside it (ignore orphan end tags)
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+class ClassroomPage:
+    def __init__(self, html, url=""):
+        self.url = url
+        parser = PageParser()
+        parser.feed(html)
+        parser.close()
+        self.root = parser.root
+
+    def get_href(self, element):
+        # selenium returns the absolute url for href
+        href = element.get_attribute("href")
+        if href is None:
+            return None
+        return urljoin(self.url, href)
+
+
+def get_difference_days(date1, date2):
+    format = "%d/%m/%Y"
+    date1 = datetime.strptime(date1, format)
+    date2 = datetime.strptime(date2, format)
+    difference = date2 - date1
+
+    return difference.days
+
+
+def extract_timeline(page, classroomId, classroom_name, subjectId, data_url, date_today):
+    timelines = dict()
+    divs = page.root.find_elements_by_class("tl-placeholder")
+    if len(divs) == 2:
+        # only in second div, an error only skips its line or activity
+        for div_inside in divs[1].find_elements_by_class("tl-line"):
+            h2_elements = div_inside.find_elements_by_tag("h2")
+            if len(h2_elements) == 0:
+                print("Error timeline: Not found h2 element in tl-line")
+                continue
+            tipo = h2_elements[0].text
+            if tipo == "":
+                print("Error timeline: Not found type activity")
+                continue
+            for a_element in div_inside.find_elements_by_tag("a"):
+                try:
+                    # Search inside each a element
+                    texto_entero = a_element.get_attribute("title") or ""
+                    lista_fechas = PATTERN_DATE.findall(texto_entero)
+                    if len(lista_fechas) == 2:
+                        inicio = lista_fechas[0]
+                        entrega = lista_fechas[1]
+                        activity_url = page.get_href(a_element)
+                        a_class = a_element.get_attribute("class") or ""
+                        activity_name = a_element.get_attribute("aria-label") or texto_entero
+                        activity_name = activity_name.split(". Inicio:")[0]
+                        completed = "completed" in a_class
+                        activity_id = a_element.get_attribute("data-id")
+                        if activity_id is None:
+                            raise ValueError("Not found data-id")
+
+                        # put into timeline variable (dates parsed only here)
+                        timelines[activity_id] = Activity(activity_id, activity_url, activity_name, classroomId,
+                                                          classroom_name, subjectId, data_url, tipo, completed,
+                                                          parse_date(inicio), parse_date(entrega), date_today)
+                    else:
+                        print("Error timeline: Not found dates")
+                except Exception as err:
+                    print(f"Error timeline: activity skipped ({err}): {a_element.get_attribute('data-id')} in {tipo}")
+
+    return timelines
+
+
+def extract_messages(page):
+    messages = list()
+    for a_element in page.root.find_elements_by_class("marcadors", "LaunchesOWin"):
+        link = page.get_href(a_element)
+        nombre = a_element.get_attribute("data-bocamoll-object-description")
+        mensajes_nuevos = 0
+        mensajes_todos = 0
+        span_elements = a_element.find_elements_by_class("new")
+        if len(span_elements) == 1:
+            mensajes_nuevos = span_elements[0].text
+        span_elements = a_element.find_elements_by_class("all")
+        if len(span_elements) == 1:
+            mensajes_todos = span_elements[0].text
+        messages.append([nombre, link, mensajes_nuevos, mensajes_todos])
+
+    return messages
+
+
+def main(argv=None):
+    # parse saved classroom pages (without browser), e.g.:
+    # py uoc_parser.py --repeat 20 931663.html 933923.html
+    arg_parser = argparse.ArgumentParser(description="Parse saved classroom html files")
+    arg_parser.add_argument("files", nargs="+", help="html files (file name = classroomId)")
+    arg_parser.add_argument("--url", default="https://campus.uoc.edu/webapps/aulaca/classroom/Classroom.action",
+                            help="url of the saved pages (for relative links)")
+    arg_parser.add_argument("--today", default=datetime.now().strftime("%d/%m/%Y"), type=parse_date,
+                            help="date dd/mm/yyyy")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="times to parse each file (benchmark)")
+    arg_parser.add_argument("--quiet", action="store_true", help="only show times")
+    args = arg_parser.parse_args(argv)
+
+    timeline = dict()
+    messages = dict()
+    for file_name in args.files:
+        with open(file_name, "r", encoding="UTF-8") as f:
+            html = f.read()
+        classroomId = re.sub(r"\.html?$", "", file_name.replace("\\", "/").split("/")[-1])
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            page = ClassroomPage(html, args.url)
+            timeline_classroom = extract_timeline(page, classroomId, classroomId, "", args.url, args.today)
+            messages_classroom = extract_messages(page)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        timeline.update({activity_id: activity.as_dict() for activity_id, activity in timeline_classroom.items()})
+        if len(messages_classroom) > 0:
+            messages[classroomId] = messages_classroom
+        print(f"{file_name}: {len(html)} bytes, {len(timeline_classroom)} activities, "
+              f"{len(messages_classroom)} forums, {elapsed * 1000:.2f} ms", file=sys.stderr)
+
+    if not args.quiet:
+        print(json.dumps({"timeline": timeline, "messages": messages}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
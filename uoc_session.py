@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import threading
+
+
+class FileLock:
+    # exclusive lock of a file between processes (and threads, each acquire opens the file again)
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self, blocking=True):
+        # False if not blocking and locked by another one
+        f = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after 10 seconds
+                        if not blocking:
+                            raise
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self.file = f
+        return True
+
+    def release(self):
+        if self.file is not None:
+            if os.name == "nt":
+                import msvcrt
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class SessionCache:
+    # campusSessionId & cookies by username, saved in a local file only readable by the user
+    def __init__(self, path=".uoc_session.json"):
+        self.path = path
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return dict()
+        try:
+            with open(self.path, "r", encoding="UTF-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return dict()
+
+    def write(self, sessions):
+        # write to temp file (permissions 600) & rename
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="UTF-8") as f:
+            json.dump(sessions, f)
+        os.replace(tmp_path, self.path)
+        os.chmod(self.path, 0o600)
+
+    def load(self, username):
+        session = self.read().get(username)
+        if session is None:
+            return None
+        # remove expired cookies
+        now = time.time()
+        session["cookies"] = [cookie for cookie in session["cookies"] if cookie.get("expiry", now + 1) > now]
+        if not any(cookie["name"] == "campusSessionId" for cookie in session["cookies"]):
+            return None
+        return session
+
+    def save(self, username, campusSessionId, cookies, user_agent=""):
+        # same file used by several processes & accounts at the same time (batch.py)
+        with FileLock(self.path + ".lock"):
+            sessions = self.read()
+            sessions[username] = {
+                "campusSessionId": campusSessionId,
+                "cookies": cookies,
+                "user_agent": user_agent,
+                "saved": time.time()
+            }
+            self.write(sessions)
+
+    def remove(self, username):
+        with FileLock(self.path + ".lock"):
+            sessions = self.read()
+            if username in sessions:
+                del sessions[username]
+                self.write(sessions)
@@ -0,0 +1,172 @@
+import time
+import sqlite3
+from datetime import date
+from uoc_model import Activity
+
+# activities & message counters of all scrapes (store_path in config), queries without browser:
+# due dates between 2 days, activities added/changed since a time, completed/reopened activities
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS activities (
+    activity_id TEXT PRIMARY KEY,
+    activity_url TEXT,
+    activity_name TEXT,
+    classroomId TEXT,
+    classroom_name TEXT,
+    subjectId TEXT,
+    classroom_url TEXT,
+    type TEXT,
+    completed INTEGER,
+    start_date TEXT,
+    end_date TEXT,
+    first_seen REAL,
+    last_seen REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS activities_end ON activities (end_date);
+CREATE INDEX IF NOT EXISTS activities_classroom ON activities (classroomId, end_date);
+CREATE INDEX IF NOT EXISTS activities_completed ON activities (completed, end_date);
+CREATE TABLE IF NOT EXISTS activity_changes (
+    activity_id TEXT,
+    changed REAL,
+    change TEXT
+);
+CREATE INDEX IF NOT EXISTS activity_changes_changed ON activity_changes (changed, change);
+CREATE TABLE IF NOT EXISTS message_counters (
+    classroomId TEXT,
+    link TEXT,
+    nombre TEXT,
+    nuevos INTEGER,
+    todos INTEGER,
+    updated REAL,
+    PRIMARY KEY (classroomId, link)
+);
+'''
+# fields compared to know if an activity changed (completed is saved as completed/reopened)
+DATA_FIELDS = ("activity_url", "activity_name", "classroomId", "classroom_name", "subjectId", "classroom_url",
+               "type", "start_date", "end_date")
+# change: added, changed, completed or reopened
+CHANGES = ("added", "changed", "completed", "reopened")
+
+
+class TimelineStore:
+    def __init__(self, path="timeline.db"):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def get_row(activity):
+        return {
+            "activity_id": activity.activity_id,
+            "activity_url": activity.activity_url,
+            "activity_name": activity.activity_name,
+            "classroomId": activity.classroomId,
+            "classroom_name": activity.classroom_name,
+            "subjectId": str(activity.subjectId),
+            "classroom_url": activity.classroom_url,
+            "type": activity.type,
+            "completed": int(activity.completed),
+            "start_date": activity.start.isoformat(),
+            "end_date": activity.end.isoformat()
+        }
+
+    @staticmethod
+    def get_activity(row, today=None):
+        return Activity(row["activity_id"], row["activity_url"], row["activity_name"], row["classroomId"],
+                        row["classroom_name"], row["subjectId"], row["classroom_url"], row["type"],
+                        bool(row["completed"]), date.fromisoformat(row["start_date"]),
+                        date.fromisoformat(row["end_date"]), today or date.today())
+
+    def save_activities(self, activities, now=None):
+        # upsert by activity_id & save the changes, returns {activity_id: [changes]}
+        # (completed/reopened & changed if both in the same scrape)
+        now = now or time.time()
+        changes = dict()
+        with self.connection:
+            for activity in activities:
+                row = TimelineStore.get_row(activity)
+                old = self.connection.execute("SELECT * FROM activities WHERE activity_id = ?",
+                                              (activity.activity_id,)).fetchone()
+                if old is None:
+                    changes[activity.activity_id] = ["added"]
+                    self.connection.execute(
+                        "INSERT INTO activities (activity_id, activity_url, activity_name, classroomId, "
+                        "classroom_name, subjectId, classroom_url, type, completed, start_date, end_date, "
+                        "first_seen, last_seen, updated) VALUES (:activity_id, :activity_url, :activity_name, "
+                        ":classroomId, :classroom_name, :subjectId, :classroom_url, :type, :completed, :start_date, "
+                        ":end_date, :now, :now, :now)", dict(row, now=now))
+                    continue
+                activity_changes = list()
+                if old["completed"] != row["completed"]:
+                    activity_changes.append("completed" if row["completed"] else "reopened")
+                if any(old[field] != row[field] for field in DATA_FIELDS):
+                    activity_changes.append("changed")
+                if len(activity_changes) > 0:
+                    changes[activity.activity_id] = activity_changes
+                    self.connection.execute(
+                        "UPDATE activities SET activity_url = :activity_url, activity_name = :activity_name, "
+                        "classroomId = :classroomId, classroom_name = :classroom_name, subjectId = :subjectId, "
+                        "classroom_url = :classroom_url, type = :type, completed = :completed, "
+                        "start_date = :start_date, end_date = :end_date, last_seen = :now, updated = :now "
+                        "WHERE activity_id = :activity_id",
+                        dict(row, now=now))
+                else:
+                    self.connection.execute("UPDATE activities SET last_seen = ? WHERE activity_id = ?",
+                                            (now, activity.activity_id))
+            self.connection.executemany("INSERT INTO activity_changes (activity_id, changed, change) "
+                                        "VALUES (?, ?, ?)",
+                                        [(activity_id, now, change) for activity_id, activity_changes in changes.items()
+                                         for change in activity_changes])
+        return changes
+
+    def save_messages(self, messages, now=None):
+        # messages of get_messages: {classroomId: [[nombre, link, nuevos, todos]]}
+        now = now or time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO message_counters (classroomId, link, nombre, nuevos, todos, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (classroomId, link) DO UPDATE SET nombre = excluded.nombre, "
+                "nuevos = excluded.nuevos, todos = excluded.todos, updated = excluded.updated",
+                [(classroomId, link, nombre, int(nuevos), int(todos), now)
+                 for classroomId, forums in messages.items() for nombre, link, nuevos, todos in forums])
+
+    def get_due(self, start, end, classroomId=None, completed=None, today=None):
+        # activities with end between start & end (dates, both included)
+        query = "SELECT * FROM activities WHERE end_date BETWEEN ? AND ?"
+        params = [start.isoformat(), end.isoformat()]
+        if classroomId is not None:
+            query += " AND classroomId = ?"
+            params.append(classroomId)
+        if completed is not None:
+            query += " AND completed = ?"
+            params.append(int(completed))
+        query += " ORDER BY end_date, start_date"
+        return [TimelineStore.get_activity(row, today) for row in self.connection.execute(query, params)]
+
+    def get_changes(self, since, changes=CHANGES, today=None):
+        # [(time, change, activity)] since a time (seconds), e.g. get_changes(time.time() - 86400)
+        placeholders = ", ".join("?" * len(changes))
+        rows = self.connection.execute(
+            "SELECT activity_changes.changed AS changed_time, activity_changes.change AS change_name, activities.* "
+            "FROM activity_changes JOIN activities USING (activity_id) "
+            f"WHERE activity_changes.changed >= ? AND activity_changes.change IN ({placeholders}) "
+            "ORDER BY activity_changes.changed, activities.end_date", [since, *changes])
+        return [(row["changed_time"], row["change_name"], TimelineStore.get_activity(row, today)) for row in rows]
+
+    def get_completion_changes(self, since, today=None):
+        return self.get_changes(since, ("completed", "reopened"), today)
+
+    def get_message_counters(self, classroomId=None):
+        # {(classroomId, link): (nombre, nuevos, todos)} like UOC.get_message_counters
+        query = "SELECT * FROM message_counters"
+        params = list()
+        if classroomId is not None:
+            query += " WHERE classroomId = ?"
+            params.append(classroomId)
+        return {(row["classroomId"], row["link"]): (row["nombre"], row["nuevos"], row["todos"])
+                for row in self.connection.execute(query, params)}